@@ -2,16 +2,24 @@ from flask_openapi3 import OpenAPI, Info, Tag
 from flask import redirect, url_for, jsonify
 from urllib.parse import unquote
 
+from sqlalchemy.engine import Engine
 from sqlalchemy.exc import IntegrityError
 
 from models import Session, Transaction, Category
+from models.accounts import DEFAULT_ACCOUNT, current_account, valid_account
 from schemas import *
 from flask_cors import CORS
+import click
 
 from controllers.category import category_routes
 from controllers.transaction import transaction_routes
 from controllers.balance_history import balance_routes
-from services.balance import calculate_balance
+from controllers.admin import admin_routes
+from controllers.metrics import metrics_routes
+from controllers.analytics import analytics_routes
+from services import accounts, metrics, slow_queries
+from services.json_provider import FastJSONProvider
+from services.importer import import_transactions, CSV, NDJSON
 
 # Define tags first
 home_tag = Tag(name="Documentação", description="Documentação da API MyBalance")
@@ -20,13 +28,15 @@ site_map_tag = Tag(name="Mapa do site", description="Mapa do site da API")
 info = Info(title="MyBalance API", version="1.0.0")
 app = OpenAPI(__name__, info=info)
 app.url_map.strict_slashes = False
+# Responses are encoded with orjson when it is installed, with the same output
+app.json = FastJSONProvider(app)
 
 # Atualiza a configuração CORS com opções adicionais
 CORS(app, resources={
     r"/*": {
         "origins": "*",
         "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"]
+        "allow_headers": ["Content-Type", "Authorization", accounts.ACCOUNT_HEADER]
     }
 })
 
@@ -49,17 +59,47 @@ app.config['OPENAPI_SWAGGER_UI_CONFIG'] = {
 app.register_api(transaction_routes)
 app.register_api(category_routes)
 app.register_api(balance_routes)
+app.register_api(admin_routes)
+app.register_api(metrics_routes)
+app.register_api(analytics_routes)
 
-# Add this function instead
-@app.before_first_request
-def init_app():
-    """Initialize application state before first request"""
-    session = Session()
+# Latency, status and SQL metrics of every request, served at /metrics.
+# The listeners are set on the Engine class, so they cover the engine of
+# every account
+metrics.init_app(app)
+metrics.instrument_engine(Engine)
+# Opt-in log of the slow statements, served at /admin/slow-queries
+slow_queries.install(Engine)
+# Each account has its own database, chosen by header or path prefix; the
+# balances of an account are checked on its first request
+accounts.init_app(app)
+
+@app.cli.command("import-transactions")
+@click.argument("file", type=click.File("r", encoding="utf-8-sig"))
+@click.option("--format", "format", type=click.Choice([CSV, NDJSON]), default=None,
+              help="Formato do arquivo. Por padrão é deduzido da extensão.")
+@click.option("--account", default=DEFAULT_ACCOUNT, help="Conta que recebe as transações.")
+def import_transactions_command(file, format, account):
+    """Importa transações de um arquivo CSV ou NDJSON."""
+    if format is None:
+        format = CSV if file.name.lower().endswith(".csv") else NDJSON
+    if not valid_account(account):
+        raise click.BadParameter("use até 64 letras, números, _ ou -", param_hint="--account")
+
+    current_account.set(account)
+    accounts.ensure_checked(account)
+    session = Session(write=True)
     try:
-        calculate_balance(session)
+        result = import_transactions(session, file, format)
     finally:
         session.close()
 
+    click.echo(f"{result['inserted']} de {result['received']} transações importadas")
+    for error in result["errors"]:
+        click.echo(f"Linha {error['row']}: {error['message']}", err=True)
+    if result["failed"] > len(result["errors"]):
+        click.echo(f"... e mais {result['failed'] - len(result['errors'])} erros", err=True)
+
 @app.get('/', tags=[home_tag])
 def home():
     """Redireciona para documentação em português.
@@ -1,4 +1,6 @@
 from controllers.transaction import add_transaction, get_transactions, search_transactions
 from controllers.category import add_category, get_categories
 from controllers.balance_history import get_balance_history, get_current_balance
-
+from controllers.admin import get_cache_stats, get_slow_queries
+from controllers.metrics import get_metrics
+from controllers.analytics import get_rolling_average, get_monthly_percentiles, get_top_categories
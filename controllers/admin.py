@@ -0,0 +1,31 @@
+from flask_openapi3 import APIBlueprint, Tag
+from schemas import CacheStatsResponse, SlowQueriesResponse
+from services.cache import read_cache
+from services.slow_queries import slow_query_log, threshold_ms
+
+admin_tag = Tag(name='Admin', description="Diagnóstico e operação da API")
+admin_routes = APIBlueprint('admin', __name__, url_prefix='/admin', abp_tags=[admin_tag])
+
+@admin_routes.get('/cache', responses={"200": CacheStatsResponse})
+def get_cache_stats():
+    """Estatísticas do cache de leitura
+    
+    Este endpoint retorna os acertos e falhas do cache dos endpoints de leitura
+    mais acessados, além da sua ocupação e configuração.
+    """
+    return read_cache.stats(), 200
+
+@admin_routes.get('/slow-queries', responses={"200": SlowQueriesResponse})
+def get_slow_queries():
+    """Comandos SQL lentos
+    
+    Este endpoint retorna os últimos comandos SQL que levaram mais que
+    `MYBALANCE_SLOW_QUERY_MS` milissegundos, com a rota que os executou, os
+    parâmetros e o plano de execução (`EXPLAIN QUERY PLAN`). O registro fica
+    desativado enquanto a variável não é definida.
+    """
+    return {
+        "enabled": slow_query_log is not None,
+        "threshold_ms": threshold_ms,
+        "queries": slow_query_log.entries() if slow_query_log else []
+    }, 200
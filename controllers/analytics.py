@@ -0,0 +1,155 @@
+from flask import jsonify
+from flask_openapi3 import APIBlueprint, Tag
+from datetime import datetime
+from models import Session, Category
+from models.money import format_cents
+from schemas import (
+    ErrorSchema, RollingAverageQuery, RollingAverageResponse, MonthlyPercentilesQuery,
+    MonthlyPercentilesResponse, TopCategoriesQuery, TopCategoriesResponse
+)
+from services import analytics
+from services.sync import conditional
+
+analytics_tag = Tag(name='Analytics', description="Análises das transações, calculadas em memória com NumPy")
+analytics_routes = APIBlueprint('analytics', __name__, url_prefix='/analytics', abp_tags=[analytics_tag])
+
+NUMPY_MISSING = "As análises precisam do NumPy, que não está instalado (pip install numpy)"
+
+def _period(query):
+    start = datetime.strptime(query.date_from, '%Y-%m-%d').date() if query.date_from else None
+    end = datetime.strptime(query.date_to, '%Y-%m-%d').date() if query.date_to else None
+    return start, end
+
+def _percentiles(value):
+    percentiles = [float(item) for item in value.split(",") if item.strip()]
+    if not percentiles or any(not 0 <= percentile <= 100 for percentile in percentiles):
+        raise ValueError("os percentis devem estar entre 0 e 100")
+    return percentiles
+
+@analytics_routes.get('/rolling', responses={
+    "200": RollingAverageResponse, "400": ErrorSchema, "503": ErrorSchema
+})
+@conditional
+def get_rolling_average(query: RollingAverageQuery):
+    """Médias móveis e saldo diário
+
+    Este endpoint retorna, para cada dia do período (`from` e `to`, YYYY-MM-DD), o
+    total das transações do tipo escolhido (`income`, `expense` ou `net`, a diferença
+    entre receitas e despesas), a sua média nos últimos `window` dias e o saldo ao
+    final do dia.
+    """
+    if not analytics.numpy_enabled:
+        return {"message": NUMPY_MISSING}, 503
+    try:
+        start, end = _period(query)
+    except ValueError as e:
+        return {"message": f"Entrada inválida: {str(e)}"}, 400
+
+    session = Session()
+    try:
+        columns = analytics.ledger_columns(session)
+        days, totals, averages, balances = analytics.rolling_average(
+            columns, start, end, query.window, query.type
+        )
+        result = [
+            {
+                "date": analytics.from_day(day).strftime('%Y-%m-%d'),
+                "amount": format_cents(total),
+                "average": format_cents(average),
+                "balance": format_cents(balance)
+            }
+            for day, total, average, balance in zip(
+                days.tolist(), totals.tolist(), analytics.round_cents(averages), balances.tolist()
+            )
+        ]
+        return jsonify({"window": query.window, "type": query.type, "days": result}), 200
+
+    finally:
+        session.close()
+
+@analytics_routes.get('/percentiles', responses={
+    "200": MonthlyPercentilesResponse, "400": ErrorSchema, "503": ErrorSchema
+})
+@conditional
+def get_monthly_percentiles(query: MonthlyPercentilesQuery):
+    """Percentis mensais dos valores das transações
+
+    Este endpoint retorna, para cada mês do período (`from` e `to`, YYYY-MM-DD), a
+    quantidade e o total das transações do tipo escolhido e os percentis dos seus
+    valores (por padrão `50,90,99`).
+    """
+    if not analytics.numpy_enabled:
+        return {"message": NUMPY_MISSING}, 503
+    try:
+        start, end = _period(query)
+        percentiles = _percentiles(query.percentiles)
+    except ValueError as e:
+        return {"message": f"Entrada inválida: {str(e)}"}, 400
+
+    session = Session()
+    try:
+        columns = analytics.ledger_columns(session)
+        months, counts, totals, values = analytics.monthly_percentiles(
+            columns, start, end, percentiles, query.type
+        )
+        labels = [f"{percentile:g}" for percentile in percentiles]
+        result = [
+            {
+                "month": month.strftime('%Y-%m'),
+                "count": count,
+                "total": format_cents(total),
+                "percentiles": {label: format_cents(value) for label, value in zip(labels, month_values)}
+            }
+            for month, count, total, month_values in zip(
+                months.tolist(), counts.tolist(), totals.tolist(), analytics.round_cents(values)
+            )
+        ]
+        return jsonify({"type": query.type, "months": result}), 200
+
+    finally:
+        session.close()
+
+@analytics_routes.get('/top-categories', responses={
+    "200": TopCategoriesResponse, "400": ErrorSchema, "503": ErrorSchema
+})
+@conditional
+def get_top_categories(query: TopCategoriesQuery):
+    """Categorias com os maiores totais
+
+    Este endpoint retorna as `limit` categorias com os maiores totais do tipo
+    escolhido no período (`from` e `to`, YYYY-MM-DD), com a quantidade de
+    transações e a fração do total de todas as categorias.
+    """
+    if not analytics.numpy_enabled:
+        return {"message": NUMPY_MISSING}, 503
+    try:
+        start, end = _period(query)
+    except ValueError as e:
+        return {"message": f"Entrada inválida: {str(e)}"}, 400
+
+    session = Session()
+    try:
+        columns = analytics.ledger_columns(session)
+        category_ids, totals, counts, shares = analytics.top_categories(
+            columns, start, end, query.limit, query.type
+        )
+        category_ids = category_ids.tolist()
+        categories = {
+            category.id: category
+            for category in session.query(Category).filter(Category.id.in_(category_ids))
+        }
+        result = [
+            {
+                "category": categories[category_id].to_dict() if category_id in categories else None,
+                "total": format_cents(total),
+                "count": count,
+                "share": round(share, 4)
+            }
+            for category_id, total, count, share in zip(
+                category_ids, totals.tolist(), counts.tolist(), shares.tolist()
+            )
+        ]
+        return jsonify({"type": query.type, "categories": result}), 200
+
+    finally:
+        session.close()
@@ -1,102 +1,220 @@
 from flask import jsonify
 from flask_openapi3 import APIBlueprint, Tag
-from models import Session, BalanceHistory
+from models import Session, BalanceHistory, BalanceMonthly
+from models.money import to_cents, format_cents
 from schemas import (
     BalanceSchema, BalanceViewSchema, ErrorSchema, BalanceListResponse,
-    BalanceCurrentResponse
+    BalanceCurrentResponse, BalanceListQuery, BalanceStatusResponse, BalanceRecalculateQuery, BalanceRecalculateResponse,
+    BalanceAtQuery, BalanceAtSchema, BalanceAtBatchSchema, BalanceAtBatchResponse
 )
-from datetime import datetime
-from services.balance import calculate_balance
+from datetime import date, datetime, timedelta
+from services.balance import (
+    calculate_balance, weekly_balance, month_start, balance_at, balance_index, balances_at
+)
+from services.cache import read_cache, invalidate_on_commit, BALANCE
+from services.sync import conditional
+from services.recalculation import request_recalculation, recalculation_status
+from services.streaming import stream_json_array, YIELD_PER
 
 balance_tag = Tag(name='Balance', description="Operações de histórico de saldo")
 balance_routes = APIBlueprint('balance', __name__, url_prefix='/balance', abp_tags=[balance_tag])
 
+def _balance_to_dict(record):
+    return {
+        "date": record.date.strftime('%Y-%m-%d'),
+        "income": format_cents(record.income),
+        "expense": format_cents(record.expense),
+        "balance": format_cents(record.balance)
+    }
+
+def _bucket_to_dict(bucket):
+    return {
+        "date": bucket[0] if isinstance(bucket[0], str) else bucket[0].strftime('%Y-%m-%d'),
+        "income": format_cents(bucket[1]),
+        "expense": format_cents(bucket[2]),
+        "balance": format_cents(bucket[3])
+    }
+
 @balance_routes.get('/', responses={"200": BalanceListResponse, "400": ErrorSchema})
-def get_balance_history():
-    """Listar todo histórico de saldo
+@conditional
+def get_balance_history(query: BalanceListQuery):
+    """Listar histórico de saldo
+    
+    Este endpoint permite aos usuários recuperar o histórico de saldo, opcionalmente
+    limitado ao período entre `from` e `to` (YYYY-MM-DD). Com `granularity` igual a
+    `week` ou `month` os dias são agrupados por semana (iniciando na segunda-feira)
+    ou por mês, com as receitas e despesas somadas e o saldo do último dia; a data
+    de cada item é o início do período.
     
-    Este endpoint permite aos usuários recuperar todo o histórico de saldo existente.
+    Com `stream=true` o histórico diário é enviado em partes à medida que é lido do banco.
     """
-    session = Session()
     try:
-        with session.begin():
-            history = session.query(BalanceHistory).all()
-            
-            result = []
-            for record in history:
-                result.append({
-                    "date": record.date.strftime('%Y-%m-%d'),
-                    "income": record.income,
-                    "expense": record.expense,
-                    "balance": record.balance
-                })
-            
-            return jsonify(result), 200
+        start = datetime.strptime(query.date_from, '%Y-%m-%d').date() if query.date_from else date.min
+        end = datetime.strptime(query.date_to, '%Y-%m-%d').date() if query.date_to else date.max
+    except ValueError as e:
+        return {"message": f"Entrada inválida: {str(e)}"}, 400
+    
+    if query.granularity == "day":
+        def history_query(session):
+            return session.query(BalanceHistory)\
+                .filter(BalanceHistory.date >= start, BalanceHistory.date <= end)\
+                .order_by(BalanceHistory.date)
+        
+        if query.stream:
+            session = Session()
+            rows = (_balance_to_dict(record) for record in history_query(session).yield_per(YIELD_PER))
+            response = stream_json_array(rows)
+            response.call_on_close(session.close)
+            return response
+        
+        def list_history(session):
+            return [_balance_to_dict(record) for record in history_query(session)]
+    
+    elif query.granularity == "week":
+        # Whole weeks, from monday to sunday
+        start = start - timedelta(days=start.weekday())
+        if end < date.max - timedelta(days=6):
+            end = end + timedelta(days=6 - end.weekday())
+        
+        def list_history(session):
+            return [_bucket_to_dict(bucket) for bucket in weekly_balance(session, start, end)]
+    
+    else:
+        def list_history(session):
+            months = session.query(
+                BalanceMonthly.month, BalanceMonthly.income, BalanceMonthly.expense, BalanceMonthly.balance
+            ).filter(
+                BalanceMonthly.month >= month_start(start), BalanceMonthly.month <= month_start(end)
+            ).order_by(BalanceMonthly.month)
+            return [_bucket_to_dict(month) for month in months]
+    
+    def cached_history():
+        session = Session()
+        try:
+            return list_history(session)
+        finally:
+            session.close()
+    
+    try:
+        key = f"history:{query.granularity}:{start}:{end}"
+        return jsonify(read_cache.get_or_set(BALANCE, key, cached_history)), 200
     
     except Exception as e:
         return {"message": f"Erro ao recuperar o histórico de saldo: {str(e)}"}, 400
-    
-    finally:
-        session.close()
 
 @balance_routes.get('/current', responses={"200": BalanceCurrentResponse, "404": ErrorSchema})
+@conditional
 def get_current_balance():
     """Recuperar saldo atual
     
-    Este endpoint permite aos usuários recuperar o saldo atual.
+    Este endpoint permite aos usuários recuperar o saldo atual. O campo `current`
+    é falso enquanto houver um recálculo em segundo plano pendente.
     """
-    session = Session()
-    try:
-        # Get the latest balance record
-        latest_balance = session.query(BalanceHistory)\
-            .order_by(BalanceHistory.date.desc())\
-            .first()
-        
-        if not latest_balance:
-            return {"balance": "0.00", "income": "0.00", "expense": "0.00"}, 200
+    def current_balance():
+        session = Session()
+        try:
+            # Get the latest balance record
+            latest_balance = session.query(BalanceHistory)\
+                .order_by(BalanceHistory.date.desc())\
+                .first()
             
-        return {
-            "balance": str(latest_balance.get_balance()),
-            "income": str(latest_balance.income),
-            "expense": str(latest_balance.expense)
-        }, 200
+            if not latest_balance:
+                return {"balance": "0.00", "income": "0.00", "expense": "0.00"}
+                
+            return {
+                "balance": str(latest_balance.get_balance()),
+                "income": format_cents(latest_balance.income),
+                "expense": format_cents(latest_balance.expense)
+            }
+        finally:
+            session.close()
+    
+    try:
+        result = read_cache.get_or_set(BALANCE, "current", current_balance)
+        return {**result, "current": _recalculation_status()["current"]}, 200
         
     except Exception as e:
         return {"message": "Erro ao recuperar o saldo atual"}, 400
+        
+def _recalculation_status():
+    session = Session()
+    try:
+        return recalculation_status(session)
+    finally:
+        session.close()
+
+def _balance_at_to_dict(day, record):
+    return {
+        "date": day.strftime('%Y-%m-%d'),
+        "balance": format_cents(record[1]) if record else "0.00",
+        "as_of": record[0].strftime('%Y-%m-%d') if record else None
+    }
+
+@balance_routes.get('/at', responses={"200": BalanceAtSchema, "400": ErrorSchema})
+@conditional
+def get_balance_at(query: BalanceAtQuery):
+    """Recuperar o saldo em uma data
+    
+    Este endpoint retorna o saldo ao final do dia `date` (YYYY-MM-DD), que é o do
+    último registro do histórico nessa data ou antes dela, indicado em `as_of`.
+    """
+    try:
+        day = datetime.strptime(query.date, '%Y-%m-%d').date()
+    except ValueError as e:
+        return {"message": f"Entrada inválida: {str(e)}"}, 400
     
+    session = Session()
+    try:
+        return _balance_at_to_dict(day, balance_at(session, day)), 200
     finally:
         session.close()
-        
+
+@balance_routes.post('/at', responses={"200": BalanceAtBatchResponse, "400": ErrorSchema})
+def get_balances_at(body: BalanceAtBatchSchema):
+    """Recuperar o saldo em várias datas
+    
+    Este endpoint retorna o saldo ao final de cada dia de `dates` (YYYY-MM-DD), na
+    ordem pedida, como em `GET /balance/at`. As datas são buscadas por bisseção no
+    histórico mantido em cache.
+    """
+    try:
+        days = [datetime.strptime(value, '%Y-%m-%d').date() for value in body.dates]
+    except ValueError as e:
+        return {"message": f"Entrada inválida: {str(e)}"}, 400
+    
+    def cached_index():
+        session = Session()
+        try:
+            return balance_index(session)
+        finally:
+            session.close()
+    
+    index = read_cache.get_or_set(BALANCE, "index", cached_index)
+    records = balances_at(index, days)
+    return {"balances": [_balance_at_to_dict(day, record) for day, record in zip(days, records)]}, 200
+
 @balance_routes.post('/', responses={"201": BalanceViewSchema, "400": ErrorSchema})
 def add_balance_history(body: BalanceSchema):
     """Adicionar um novo registro de saldo
     
     Este endpoint permite aos usuários criar um novo registro de saldo.
     """
-    session = Session()
+    session = Session(write=True)
     try:
-        data = request.get_json()
-        
         # Create new balance history record
         balance_record = BalanceHistory(
-            date=datetime.strptime(data['date'], '%Y-%m-%d').date(),
-            income=data['income'],
-            expense=data['expense'],
-            balance=data['balance']
+            date=datetime.strptime(body.date, '%Y-%m-%d').date(),
+            income=to_cents(body.income),
+            expense=to_cents(body.expense),
+            balance=to_cents(body.balance)
         )
         
         # Use merge instead of add to handle existing records
         balance_record = session.merge(balance_record)
+        invalidate_on_commit(session, BALANCE)
         session.commit()
         
-        result = {
-            "date": balance_record.date.strftime('%Y-%m-%d'),
-            "income": balance_record.income,
-            "expense": balance_record.expense,
-            "balance": balance_record.balance
-        }
-        
-        return jsonify(result), 201
+        return jsonify(_balance_to_dict(balance_record)), 201
         
     except Exception as e:
         session.rollback()
@@ -105,17 +223,39 @@ def add_balance_history(body: BalanceSchema):
     finally:
         session.close()
 
-@balance_routes.post('/recalculate', responses={"200": None, "400": ErrorSchema})
-def recalculate_balance():
+@balance_routes.post('/recalculate', responses={
+    "200": BalanceRecalculateResponse, "202": BalanceStatusResponse, "400": ErrorSchema
+})
+def recalculate_balance(query: BalanceRecalculateQuery):
     """Recalcular histórico de saldo
     
-    Este endpoint permite aos usuários recalcular todo o histórico de saldo.
+    Este endpoint permite aos usuários recalcular todo o histórico de saldo. Com
+    `async=true` o recálculo é feito em segundo plano, sem ocupar a requisição: a
+    resposta `202` traz o estado do recálculo, que fica concluído quando
+    `applied_version` de `GET /balance/status` alcança `requested_version`, e pedidos
+    feitos enquanto um recálculo espera são atendidos por ele.
     """
-    session = Session()
+    if query.run_async:
+        request_recalculation(date.min)
+        return _recalculation_status(), 202
+    
+    session = Session(write=True)
     try:
         calculate_balance(session)
         return {"message": "Histórico de saldo recalculado com sucesso"}, 200
     except Exception as e:
         return {"message": f"Erro ao recalcular o saldo: {str(e)}"}, 400
     finally:
-        session.close()
\ No newline at end of file
+        session.close()
+
+@balance_routes.get('/status', responses={"200": BalanceStatusResponse})
+def get_balance_status():
+    """Estado do recálculo de saldo
+    
+    Este endpoint informa se o histórico de saldo está atualizado. No modo em
+    segundo plano (`MYBALANCE_BALANCE_MODE=background`), as escritas apenas agendam
+    o recálculo, e os saldos ficam atualizados quando `applied_version` alcança
+    `requested_version`. `current` e `dirty_from` também consideram os recálculos
+    pendentes registrados no banco por outros processos.
+    """
+    return _recalculation_status(), 200
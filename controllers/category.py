@@ -3,28 +3,87 @@ from flask_openapi3 import APIBlueprint, Tag
 from typing import List
 from schemas import (
     CategoryDeletePathSchema, CategoryBodySchema, CategoryViewSchema, ErrorSchema, CategoryListResponse,
-    CategorySearchByIdPathSchema, CategoryUpdatePathSchema, CategoryUpdateBodySchema, CategoryUpdateResponse
+    CategorySearchByIdPathSchema, CategoryUpdatePathSchema, CategoryUpdateBodySchema, CategoryUpdateResponse,
+    CategorySummaryQuery, CategorySummaryResponse
 )
-from models import Session, Category
+from datetime import datetime
+from models import Session, Category, CategorySummary
+from models.money import format_cents
+from services.category_summary import category_transaction_count
+from services.sync import conditional
+from services.cache import read_cache, invalidate_on_commit, CATEGORY
+from services.consistency import keep_consistent
 
 category_tag = Tag(name='Category', description="Adição, visualização e remoção de categorias para o banco de dados")
 category_routes = APIBlueprint('category', __name__, url_prefix='/category', abp_tags=[category_tag])
 
 @category_routes.get('/', responses={"200": CategoryListResponse})
+@conditional
 def get_categories():
     """Lista todas as categorias
     
     Neste endpoint, o usuário pode listar todas as categorias existentes.
      
     """
-    session = Session()
-    categories = session.query(Category).all()
+    def list_categories():
+        session = Session()
+        try:
+            categories = session.query(Category).all()
+            
+            result = []
+            for category in categories:
+                result.append(category.to_dict())
+            
+            return {"categories": result}
+        
+        finally:
+            session.close()
+    
+    return jsonify(read_cache.get_or_set(CATEGORY, "list", list_categories)), 200
+
+@category_routes.get('/summary', responses={"200": CategorySummaryResponse, "400": ErrorSchema})
+@conditional
+def get_category_summary(query: CategorySummaryQuery):
+    """Resumo de receitas e despesas por categoria e mês
+    
+    Neste endpoint, o usuário pode consultar, para cada categoria e mês, o total de
+    receitas, de despesas e a quantidade de transações, opcionalmente limitado aos
+    meses entre `from` e `to` (YYYY-MM) e a uma categoria.
+    
+    """
+    try:
+        session = Session()
+        summary = session.query(CategorySummary, Category)\
+            .outerjoin(Category, CategorySummary.category_id == Category.id)
+        
+        if query.month_from:
+            summary = summary.filter(
+                CategorySummary.month >= datetime.strptime(query.month_from, '%Y-%m').date()
+            )
+        if query.month_to:
+            summary = summary.filter(
+                CategorySummary.month <= datetime.strptime(query.month_to, '%Y-%m').date()
+            )
+        if query.category_id is not None:
+            summary = summary.filter(CategorySummary.category_id == query.category_id)
+        
+        result = []
+        for row, category in summary.order_by(CategorySummary.month, CategorySummary.category_id):
+            result.append({
+                "category": category.to_dict() if category else None,
+                "month": row.month.strftime('%Y-%m'),
+                "income": format_cents(row.income),
+                "expense": format_cents(row.expense),
+                "count": row.count
+            })
+        
+        return jsonify({"summary": result}), 200
     
-    result = []
-    for category in categories:
-        result.append(category.to_dict())
+    except ValueError as e:
+        return {"message": f"Entrada inválida: {str(e)}"}, 400
     
-    return jsonify({"categories": result}), 200
+    finally:
+        session.close()
 
 @category_routes.get('/<int:id>', responses={"200": CategoryViewSchema, "404": ErrorSchema, "400": ErrorSchema})
 def get_category(path: CategorySearchByIdPathSchema):
@@ -34,8 +93,16 @@ def get_category(path: CategorySearchByIdPathSchema):
      
     """
     session = Session()
-    category = session.query(Category).get(path.id)
-    return jsonify(category.to_dict()), 200
+    try:
+        category = session.query(Category).get(path.id)
+        
+        if category is None:
+            return {"message": f"Categoria com id {path.id} não encontrada"}, 404
+        
+        return jsonify(category.to_dict()), 200
+    
+    finally:
+        session.close()
 
 @category_routes.post('/', responses={"201": CategoryViewSchema, "400": ErrorSchema})
 def add_category(body: CategoryBodySchema):
@@ -45,10 +112,13 @@ def add_category(body: CategoryBodySchema):
      
     """
     try:
-        session = Session()
+        session = Session(write=True)
         category = Category(name=body.name)
         
         session.add(category)
+        invalidate_on_commit(session, CATEGORY)
+        # Categories do not affect the balances, which stay as consistent as they were
+        keep_consistent(session)
         session.commit()
         
         return jsonify(category.to_dict()), 201
@@ -68,9 +138,12 @@ def update_category(path: CategoryUpdatePathSchema, body: CategoryUpdateBodySche
      
     """
     try:
-        session = Session()
+        session = Session(write=True)
         category = session.query(Category).get(path.id)
         category.name = body.name
+        invalidate_on_commit(session, CATEGORY)
+        # Categories do not affect the balances, which stay as consistent as they were
+        keep_consistent(session)
         session.commit()
         return jsonify(category.to_dict()), 200
     
@@ -89,19 +162,22 @@ def delete_category(path: CategoryDeletePathSchema):
     Retorna erro 400 se existirem transações associadas a esta categoria.
     """
     try:
-        session = Session()
+        session = Session(write=True)
         category = session.query(Category).get(path.id)
         
         if category is None:
             return {"message": f"Categoria com id {path.id} não encontrada"}, 404
         
         # Check if there are any transactions using this category
-        if hasattr(category, 'transactions') and len(category.transactions) > 0:
+        if category_transaction_count(session, category.id) > 0:
             return {
                 "message": "Não é possível deletar uma categoria que possui transações. Remova ou reatribua as transações primeiro."
             }, 400
             
         session.delete(category)
+        invalidate_on_commit(session, CATEGORY)
+        # Categories do not affect the balances, which stay as consistent as they were
+        keep_consistent(session)
         session.commit()
         return '', 204
         
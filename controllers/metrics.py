@@ -0,0 +1,17 @@
+from flask import Response
+from flask_openapi3 import APIBlueprint
+
+from controllers.admin import admin_tag
+from services import metrics
+
+metrics_routes = APIBlueprint('metrics', __name__, abp_tags=[admin_tag])
+
+@metrics_routes.get('/metrics', responses={"200": None})
+def get_metrics():
+    """Métricas no formato do Prometheus
+    
+    Este endpoint retorna a latência, o número de requisições por status e o
+    número e o tempo dos comandos SQL de cada rota, as requisições em andamento
+    e a duração dos recálculos do saldo, no formato de texto do Prometheus.
+    """
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
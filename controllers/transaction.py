@@ -1,34 +1,162 @@
 from flask import jsonify, request
+import csv
+import json
+import logging
 from flask_openapi3 import APIBlueprint, Tag
 from models import Session, Transaction, Category
+from models.money import to_cents
 from datetime import datetime
 from schemas import (
     TransactionSchema, TransactionSearchQuery, TransactionViewSchema,
     TransactionListResponse, ErrorSchema, TransactionUpdatePathSchema,
     TransactionUpdateBodySchema, TransactionUpdateResponse, TransactionDeletePathSchema,
-    TransactionSearchByIdPathSchema
+    TransactionSearchByIdPathSchema, TransactionBulkQuery, TransactionBulkResponse,
+    TransactionListQuery, TransactionPageResponse, TransactionSearchResponse,
+    TransactionChangesQuery, TransactionChangesResponse, TransactionBatchSchema, TransactionBatchResponse
 )
+from sqlalchemy import tuple_
 from sqlalchemy.exc import IntegrityError
-from services.balance import calculate_balance
+from services.balance import LedgerEntry, apply_entry
+from services.category_summary import apply_summary
+from services.search import search_query
+from services.sync import conditional, transaction_changes
+from services.streaming import stream_json_array, YIELD_PER
+from services.pagination import encode_cursor, decode_cursor
+from services.importer import import_transactions, text_stream, FORMATS_BY_MIMETYPE
+from services.batch import apply_batch, BatchOperationError
 
 transaction_tag = Tag(name='Transaction', description="Operações de transação para gerenciar registros financeiros")
+DEFAULT_PAGE_SIZE = 50
+
 transaction_routes = APIBlueprint('transaction', __name__, url_prefix='/transaction', abp_tags=[transaction_tag])
 
-@transaction_routes.get('/', responses={"200": TransactionListResponse})
-def get_transactions():
-    """Listar todas as transações
+logger = logging.getLogger(__name__)
+
+def _list_query(session, query):
+    """Builds the filtered and keyset ordered query of the transaction listing."""
+    transactions = Transaction.query_rows(session)
+    
+    if query.date_from:
+        transactions = transactions.filter(
+            Transaction.date >= datetime.strptime(query.date_from, '%Y-%m-%d').date()
+        )
+    if query.date_to:
+        transactions = transactions.filter(
+            Transaction.date <= datetime.strptime(query.date_to, '%Y-%m-%d').date()
+        )
+    if query.type:
+        transactions = transactions.filter(Transaction.type == query.type)
+    if query.category_id is not None:
+        transactions = transactions.filter(Transaction.category_id == query.category_id)
+    if query.amount_min is not None:
+        transactions = transactions.filter(Transaction.amount >= to_cents(query.amount_min))
+    if query.amount_max is not None:
+        transactions = transactions.filter(Transaction.amount <= to_cents(query.amount_max))
+    
+    # Keyset pagination: continue right after the last (date, id) of the
+    # previous page, so every page is an index range scan
+    if query.cursor:
+        cursor_date, cursor_id = decode_cursor(query.cursor)
+        transactions = transactions.filter(
+            tuple_(Transaction.date, Transaction.id) < tuple_(cursor_date, cursor_id)
+        )
+    
+    return transactions.order_by(Transaction.date.desc(), Transaction.id.desc())
+
+def _stream_transactions(session, transactions, limit=None):
+    """Streams the transactions as {"transactions": [...], "next_cursor": ...}.
     
-    Este endpoint permite aos usuários recuperar todas as transações existentes,
-    ordenadas por data (mais recentes primeiro).
+    Without a limit every row is streamed and next_cursor is always null.
+    """
+    if limit is not None:
+        transactions = transactions.limit(limit + 1)
+    
+    state = {"last": None, "more": False}
+    
+    def rows():
+        for count, transaction in enumerate(transactions.yield_per(YIELD_PER)):
+            if limit is not None and count == limit:
+                state["more"] = True
+                break
+            state["last"] = (transaction.date, transaction.id)
+            yield Transaction.row_to_dict(transaction)
+    
+    def suffix():
+        next_cursor = encode_cursor(*state["last"]) if state["more"] else None
+        return '],"next_cursor":%s}' % json.dumps(next_cursor)
+    
+    response = stream_json_array(rows(), prefix='{"transactions":[', suffix=suffix)
+    response.call_on_close(session.close)
+    return response
+
+@transaction_routes.get('/', responses={"200": TransactionPageResponse, "400": ErrorSchema})
+@conditional
+def get_transactions(query: TransactionListQuery):
+    """Listar transações
+    
+    Este endpoint permite aos usuários recuperar as transações existentes,
+    ordenadas por data (mais recentes primeiro), em páginas de até `limit` itens
+    (50 por padrão). Para obter a página seguinte, envie o `next_cursor` recebido
+    como `cursor`. Também é possível filtrar por período, tipo, categoria e faixa
+    de valor.
+    
+    Com `stream=true` a resposta é enviada em partes à medida que é lida do banco,
+    e todas as transações são retornadas quando `limit` não é informado.
+    
+    A resposta traz a versão dos dados no `ETag`; enviando-a em `If-None-Match`,
+    a resposta é 304 sem corpo enquanto nada mudar.
     """
     session = Session()
-    transactions = session.query(Transaction).order_by(Transaction.date.desc()).all()
+    try:
+        transactions = _list_query(session, query)
+    except ValueError as e:
+        session.close()
+        return {"message": f"Entrada inválida: {str(e)}"}, 400
+    
+    if query.stream:
+        return _stream_transactions(session, transactions, query.limit)
+    
+    try:
+        limit = query.limit or DEFAULT_PAGE_SIZE
+        transactions = transactions.limit(limit + 1).all()
+        
+        next_cursor = None
+        if len(transactions) > limit:
+            transactions = transactions[:limit]
+            last = transactions[-1]
+            next_cursor = encode_cursor(last.date, last.id)
+        
+        result = []
+        for transaction in transactions:
+            result.append(Transaction.row_to_dict(transaction))
+        
+        return jsonify({"transactions": result, "next_cursor": next_cursor}), 200
+    
+    finally:
+        session.close()
+
+@transaction_routes.get('/changes', responses={"200": TransactionChangesResponse, "400": ErrorSchema})
+@conditional
+def get_transaction_changes(query: TransactionChangesQuery):
+    """Listar alterações de transações desde uma versão
+    
+    Este endpoint permite aos clientes sincronizar suas transações baixando apenas
+    as inseridas, alteradas ou excluídas (com `op` igual a `delete` e `transaction`
+    nulo) depois da versão `since`, da mais antiga para a mais recente. A `version`
+    retornada deve ser usada como `since` na próxima chamada; enquanto `has_more`
+    for verdadeiro ainda há alterações a buscar. Renomear uma categoria altera as
+    suas transações, que voltam a ser listadas com o novo nome.
+    """
+    try:
+        session = Session()
+        changes, version, has_more = transaction_changes(session, query.since, query.limit)
+        return jsonify({"version": version, "has_more": has_more, "changes": changes}), 200
     
-    result = []
-    for transaction in transactions:
-        result.append(transaction.to_dict())
+    except Exception as e:
+        return {"message": "Erro ao recuperar as alterações"}, 400
     
-    return jsonify({"transactions": result}), 200
+    finally:
+        session.close()
 
 @transaction_routes.get('/<int:id>', responses={"200": TransactionViewSchema, "404": ErrorSchema})
 def get_transaction(path: TransactionSearchByIdPathSchema):
@@ -58,7 +186,7 @@ def add_transaction(body: TransactionSchema):
     Este endpoint permite aos usuários criar um novo registro de transação.
     """
     try:
-        session = Session()
+        session = Session(write=True)
         
         # Handle optional category
         category = None
@@ -80,10 +208,13 @@ def add_transaction(body: TransactionSchema):
             transaction.category_id = category.id
         
         session.add(transaction)
-        session.commit()
+        session.flush()
         
-        # Recalculate balance after adding new transaction
-        calculate_balance(session)
+        # Apply the new transaction to the balance history and category summary
+        entry = LedgerEntry.of(transaction)
+        apply_entry(session, entry)
+        apply_summary(session, entry)
+        session.commit()
         
         return jsonify(transaction.to_dict()), 201
         
@@ -102,6 +233,64 @@ def add_transaction(body: TransactionSchema):
     finally:
         session.close()
 
+@transaction_routes.post('/bulk', responses={"200": TransactionBulkResponse, "400": ErrorSchema})
+def bulk_import_transactions(query: TransactionBulkQuery):
+    """Importar transações em lote
+    
+    Este endpoint permite aos usuários importar um extrato em CSV (com cabeçalho)
+    ou NDJSON, com os mesmos campos de uma nova transação. O corpo é lido como
+    stream, as linhas válidas são inseridas em lotes e o histórico de saldo é
+    recalculado uma única vez ao final. Linhas inválidas são ignoradas e
+    reportadas no resumo da importação.
+    """
+    format = query.format or FORMATS_BY_MIMETYPE.get(request.mimetype)
+    if format is None:
+        return {"message": "Formato não suportado. Use CSV ou NDJSON."}, 400
+
+    try:
+        session = Session(write=True)
+        result = import_transactions(session, text_stream(request.stream), format)
+        return jsonify(result), 200
+
+    except (UnicodeDecodeError, csv.Error):
+        logger.exception("Falha ao ler as transações importadas")
+        return {"message": "Não foi possível ler o arquivo: use CSV ou NDJSON em UTF-8. "
+                           "As transações lidas até o erro foram importadas."}, 400
+    except Exception:
+        logger.exception("Falha ao importar as transações")
+        return {"message": "Não foi possível importar as transações. "
+                           "As transações lidas até o erro foram importadas."}, 400
+
+    finally:
+        session.close()
+
+@transaction_routes.post('/batch', responses={"200": TransactionBatchResponse, "400": ErrorSchema, "404": ErrorSchema})
+def batch_transactions(body: TransactionBatchSchema):
+    """Criar, atualizar e remover transações em lote
+    
+    Este endpoint aplica uma lista de operações (`create`, `update` ou `delete`),
+    na ordem, em uma única transação do banco de dados: ou todas são aplicadas,
+    ou nenhuma. As categorias são consultadas uma única vez e o histórico de
+    saldo é atualizado uma vez para o lote inteiro. Em caso de erro, a mensagem
+    indica a posição da operação que falhou.
+    """
+    try:
+        session = Session(write=True)
+        results = apply_batch(session, body.operations)
+        session.commit()
+        return jsonify({"results": results}), 200
+
+    except BatchOperationError as e:
+        session.rollback()
+        return {"message": str(e)}, e.status
+    except Exception:
+        session.rollback()
+        logger.exception("Falha ao aplicar o lote de transações")
+        return {"message": "Não foi possível aplicar o lote; nenhuma operação foi aplicada"}, 400
+
+    finally:
+        session.close()
+
 @transaction_routes.put('/<int:id>', responses={"200": TransactionUpdateResponse, "404": ErrorSchema, "400": ErrorSchema})
 def update_transaction(path: TransactionUpdatePathSchema, body: TransactionSchema):
     """Atualizar uma transação
@@ -109,11 +298,13 @@ def update_transaction(path: TransactionUpdatePathSchema, body: TransactionSchem
     Este endpoint permite aos usuários atualizar uma transação existente.
     """
     try:
-        session = Session()
+        session = Session(write=True)
         transaction = session.query(Transaction).get(path.id)
         
         if transaction is None:
             return {"message": f"Transação com id {path.id} não encontrada"}, 404
+        
+        previous_entry = LedgerEntry.of(transaction)
             
         # Handle category update
         if body.category_id:
@@ -124,13 +315,21 @@ def update_transaction(path: TransactionUpdatePathSchema, body: TransactionSchem
             transaction.category_id = category.id
         # Don't update category if not provided in request
         
-        date = datetime.strptime(body.date, '%Y-%m-%d')
+        date = datetime.strptime(body.date, '%Y-%m-%d').date()
         
         transaction.description = body.description
-        transaction.amount = body.amount
+        transaction.amount = to_cents(body.amount)
         transaction.date = date
         transaction.type = body.type
+        session.flush()
         
+        # Move the transaction contribution in the balance history and
+        # category summary, as it may be on a different date or category now
+        entry = LedgerEntry.of(transaction)
+        apply_entry(session, previous_entry, sign=-1)
+        apply_entry(session, entry)
+        apply_summary(session, previous_entry, sign=-1)
+        apply_summary(session, entry)
         session.commit()
         return jsonify(transaction.to_dict()), 200
         
@@ -142,23 +341,43 @@ def update_transaction(path: TransactionUpdatePathSchema, body: TransactionSchem
     finally:
         session.close()
 
-@transaction_routes.get('/search', responses={"200": TransactionListResponse, "400": ErrorSchema})
+@transaction_routes.get('/search', responses={"200": TransactionSearchResponse, "400": ErrorSchema})
+@conditional
 def search_transactions(query: TransactionSearchQuery):
     """Pesquisar transações por descrição
     
-    Este endpoint permite aos usuários pesquisar transações pela descrição.
+    Este endpoint permite aos usuários pesquisar transações pela descrição e pelo
+    nome da categoria. Cada palavra do termo é buscada como prefixo e os resultados
+    são ordenados por relevância, em páginas de até `limit` itens (50 por padrão).
+    Para obter a página seguinte, envie o `next_offset` recebido como `offset`.
+    Com `stream=true` a resposta é enviada em partes à medida que é lida do banco,
+    e todos os resultados são retornados quando `limit` não é informado.
     """
+    session = Session()
+    transactions = search_query(session, query.term).offset(query.offset)
+    
+    if query.stream:
+        if query.limit is not None:
+            transactions = transactions.limit(query.limit)
+        rows = (Transaction.row_to_dict(transaction) for transaction in transactions.yield_per(YIELD_PER))
+        response = stream_json_array(rows, prefix='{"transactions":[', suffix=lambda: ']}')
+        response.call_on_close(session.close)
+        return response
+    
     try:
-        session = Session()
-        transactions = session.query(Transaction).filter(
-            Transaction.description.ilike(f'%{query.term}%')
-        ).all()
+        limit = query.limit or DEFAULT_PAGE_SIZE
+        transactions = transactions.limit(limit + 1).all()
+        
+        next_offset = None
+        if len(transactions) > limit:
+            transactions = transactions[:limit]
+            next_offset = query.offset + limit
         
         result = []
         for transaction in transactions:
-            result.append(transaction.to_dict())
+            result.append(Transaction.row_to_dict(transaction))
             
-        return jsonify({"transactions": result}), 200
+        return jsonify({"transactions": result, "next_offset": next_offset}), 200
         
     except Exception as e:
         return {"message": "Erro ao pesquisar transações"}, 400
@@ -173,17 +392,20 @@ def delete_transaction(path: TransactionDeletePathSchema):
     Este endpoint permite aos usuários excluir uma transação existente.
     """
     try:
-        session = Session()
+        session = Session(write=True)
         transaction = session.query(Transaction).get(path.id)
         
         if transaction is None:
             return {"message": f"Transação com id {path.id} não encontrada"}, 404
             
+        entry = LedgerEntry.of(transaction)
         session.delete(transaction)
-        session.commit()
+        session.flush()
         
-        # Recalculate balance after deletion
-        calculate_balance(session)
+        # Revert the transaction from the balance history and category summary
+        apply_entry(session, entry, sign=-1)
+        apply_summary(session, entry, sign=-1)
+        session.commit()
         
         return '', 204
         
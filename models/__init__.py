@@ -1,11 +1,11 @@
-from sqlalchemy_utils import database_exists, create_database
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
-from sqlalchemy.pool import StaticPool
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import QueuePool
 import os
 
 # importing base first
 from models.base import Base
+from models.accounts import WRITE_TRANSACTION
 
 db_path = "database/"
 # Check if directory doesn't exist
@@ -16,27 +16,133 @@ if not os.path.exists(db_path):
 # database access url (this is a url for local sqlite access)
 db_url = 'sqlite:///%s/db.sqlite3' % db_path
 
-# create the connection engine with the database
-engine = create_engine(
-    db_url,
-    echo=False,
-    connect_args={
-        "check_same_thread": False
-    },
-    poolclass=StaticPool
-)
+# connection settings, which can be changed with environment variables
+db_pool_size = int(os.environ.get("MYBALANCE_DB_POOL_SIZE", 5))
+db_max_overflow = int(os.environ.get("MYBALANCE_DB_MAX_OVERFLOW", 10))
+db_busy_timeout = int(os.environ.get("MYBALANCE_DB_BUSY_TIMEOUT", 5000))  # milliseconds
+db_journal_mode = os.environ.get("MYBALANCE_DB_JOURNAL_MODE", "WAL")
+db_synchronous = os.environ.get("MYBALANCE_DB_SYNCHRONOUS", "NORMAL")
 
-# Instance a session creator with the database
-Session = sessionmaker(bind=engine)
+# each account other than the default one has its own database in this
+# directory, and at most this many of them are kept open
+accounts_path = os.path.join(db_path, "accounts")
+max_open_accounts = int(os.environ.get("MYBALANCE_MAX_OPEN_ACCOUNTS", 32))
 
-# create the database if it doesn't exist
-if not database_exists(engine.url):
-    create_database(engine.url) 
+
+def create_sqlite_engine(url):
+    """
+    Creates the connection engine of a database. Each session checks out
+    its own connection from the pool, so concurrent requests never share one;
+    check_same_thread is disabled only because pooled connections are reused
+    by other threads after being returned.
+    """
+    sqlite_engine = create_engine(
+        url,
+        echo=False,
+        connect_args={
+            "check_same_thread": False,
+            "timeout": db_busy_timeout / 1000
+        },
+        poolclass=QueuePool,
+        pool_size=db_pool_size,
+        max_overflow=db_max_overflow
+    )
+    event.listen(sqlite_engine, "connect", set_sqlite_pragmas)
+    event.listen(sqlite_engine, "begin", begin_transaction)
+    return sqlite_engine
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    In WAL mode readers keep reading the last committed state while a write
+    (e.g. a balance rebuild) is in progress, instead of waiting for it.
+    Concurrent writers wait up to busy_timeout for the write lock.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={db_journal_mode}")
+    cursor.execute(f"PRAGMA synchronous={db_synchronous}")
+    cursor.execute(f"PRAGMA busy_timeout={db_busy_timeout}")
+    cursor.close()
+    # pysqlite only sends BEGIN right before the first write of a transaction,
+    # so whatever was read before ran outside of it; transactions are begun by
+    # begin_transaction instead
+    dbapi_connection.isolation_level = None
+
+
+def begin_transaction(connection):
+    """
+    Begins every transaction explicitly. Write sessions begin with BEGIN
+    IMMEDIATE, taking the write lock before their first read: two requests
+    changing the same row run one after the other, and the second one reads
+    what the first committed. Reads begin a deferred transaction, which never
+    waits for the writers in WAL mode.
+    """
+    if connection.get_execution_options().get(WRITE_TRANSACTION):
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+    else:
+        connection.exec_driver_sql("BEGIN")
+
+# create the connection engine with the database of the default account
+engine = create_sqlite_engine(db_url)
+
+# create the database if it doesn't exist. sqlalchemy_utils is slow to
+# import, so it is only loaded when the database file is missing
+if not os.path.exists(engine.url.database):
+    from sqlalchemy_utils import database_exists, create_database
+    if not database_exists(engine.url):
+        create_database(engine.url)
 
 # Now import the models
 from models.transaction import Transaction
 from models.category import Category
 from models.balance_history import BalanceHistory
-# create the database tables, if they don't exist
-Base.metadata.create_all(engine)
+from models.balance_monthly import BalanceMonthly
+from models.category_summary import CategorySummary
+from models.change_log import ChangeLog
+from models.ledger_state import LedgerState
+from models.migrations import migrate_money_to_cents
+from models.search import create_search_index, transactions_fts
+from models.change_log import create_change_triggers
+from models.ledger_state import create_ledger_state
+
+
+def setup_database(database_engine):
+    """
+    Creates the tables, indexes and triggers of a database, upgrading an
+    existing one. Returns whether full text search is available.
+    """
+    # create the database tables, if they don't exist
+    Base.metadata.create_all(database_engine)
+    # convert databases that still store money as text
+    migrate_money_to_cents(database_engine, Base.metadata)
+    # create_all only creates the indexes of new tables, so indexes added later
+    # to existing tables are created here
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(database_engine, checkfirst=True)
+
+    # create the full text search index of the transactions
+    enabled = create_search_index(database_engine)
+    # log the changes of every row, for conditional requests and sync
+    create_change_triggers(database_engine)
+    # the watermark of the balances consistency
+    create_ledger_state(database_engine)
+    return enabled
+
+
+search_enabled = setup_database(engine)
+
+
+def open_account_engine(account):
+    """Opens the database of an account, creating it on first use."""
+    os.makedirs(accounts_path, exist_ok=True)
+    account_engine = create_sqlite_engine('sqlite:///%s' % os.path.join(accounts_path, f"{account}.sqlite3"))
+    setup_database(account_engine)
+    return account_engine
+
 
+# Sessions are bound to the database of the current account (see
+# models.accounts), the default account using the engine above
+from models.accounts import AccountSession, EnginePool, DEFAULT_ACCOUNT
+engines = EnginePool(open_account_engine, max_engines=max_open_accounts, pinned={DEFAULT_ACCOUNT: engine})
+Session = sessionmaker(class_=AccountSession, engines=engines)
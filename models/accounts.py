@@ -0,0 +1,90 @@
+import re
+import threading
+from collections import OrderedDict
+from contextvars import ContextVar
+
+from sqlalchemy.orm import Session as OrmSession
+
+# Requests without an account use the original database
+DEFAULT_ACCOUNT = "default"
+
+ACCOUNT_NAME = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+# Execution option of the connections of write sessions, whose transactions
+# take the write lock when they begin (see models.begin_transaction)
+WRITE_TRANSACTION = "write_transaction"
+
+# Account of the code running now, set for each request
+current_account = ContextVar("current_account", default=DEFAULT_ACCOUNT)
+
+
+def valid_account(account):
+    """Account names end up in file names, so only letters, digits, _ and - are allowed."""
+    return bool(ACCOUNT_NAME.fullmatch(account))
+
+
+class EnginePool:
+    """
+    Engines of the account databases, opened on demand by open_engine and
+    kept for the most recently used max_engines accounts. The engine of an
+    evicted account is disposed: its idle connections are closed, while the
+    ones still in use are closed when returned.
+
+    Pinned engines (e.g. the default account) are never evicted.
+    """
+
+    def __init__(self, open_engine, max_engines=32, pinned=None):
+        self.open_engine = open_engine
+        self.max_engines = max_engines
+        self._pinned = dict(pinned or {})
+        self._engines = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, account):
+        engine = self._pinned.get(account)
+        if engine is not None:
+            return engine
+
+        with self._lock:
+            engine = self._engines.get(account)
+            if engine is not None:
+                self._engines.move_to_end(account)
+                return engine
+
+            # Opened under the lock, so an account is never set up twice at once
+            engine = self._engines[account] = self.open_engine(account)
+            while len(self._engines) > self.max_engines:
+                _, evicted = self._engines.popitem(last=False)
+                evicted.dispose()
+            return engine
+
+    def open_accounts(self):
+        with self._lock:
+            return list(self._pinned) + list(self._engines)
+
+
+class AccountSession(OrmSession):
+    """
+    Session bound to the database of an account: the one given, or the
+    current account when the session is created.
+
+    Sessions that read rows to change them must be created with write=True,
+    so each of their transactions holds the write lock from its first
+    statement and nothing they read changes before they commit.
+    """
+
+    def __init__(self, *args, engines=None, account=None, write=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.engines = engines
+        self.account = account or current_account.get()
+        self.write = write
+        self._account_engine = None
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._account_engine is None:
+            engine = self.engines.get(self.account)
+            if self.write:
+                # Shares the pool of the engine, only the option differs
+                engine = engine.execution_options(**{WRITE_TRANSACTION: True})
+            self._account_engine = engine
+        return self._account_engine
@@ -1,6 +1,6 @@
-from sqlalchemy import Column, String, Integer, Date
-from decimal import Decimal
+from sqlalchemy import Column, Integer, Date
 from models import Base
+from models.money import from_cents
 
 # Balance History Table
 class BalanceHistory(Base):
@@ -8,15 +8,16 @@ class BalanceHistory(Base):
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     date = Column(Date, unique=True, nullable=False, index=True)
-    income = Column(String(20), default='0', nullable=False)
-    expense = Column(String(20), default='0', nullable=False)
-    balance = Column(String(20), default='0', nullable=False)
+    # Money columns are in cents
+    income = Column(Integer, default=0, nullable=False)
+    expense = Column(Integer, default=0, nullable=False)
+    balance = Column(Integer, default=0, nullable=False)
 
-    def __init__(self, date, balance, income='0', expense='0'):
+    def __init__(self, date, balance, income=0, expense=0):
         self.date = date
-        self.balance = str(Decimal(str(balance)))
-        self.income = str(Decimal(str(income)))
-        self.expense = str(Decimal(str(expense)))
+        self.balance = balance
+        self.income = income
+        self.expense = expense
 
     def get_balance(self):
-        return Decimal(self.balance)
+        return from_cents(self.balance)
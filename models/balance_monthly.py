@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, Date
+from models import Base
+from models.money import from_cents
+
+# Monthly rollup of the balance history, maintained with it
+class BalanceMonthly(Base):
+    __tablename__ = "balance_monthly"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    month = Column(Date, unique=True, nullable=False, index=True)  # first day of the month
+    # Money columns are in cents; balance is the closing balance of the month
+    income = Column(Integer, default=0, nullable=False)
+    expense = Column(Integer, default=0, nullable=False)
+    balance = Column(Integer, default=0, nullable=False)
+
+    def get_balance(self):
+        return from_cents(self.balance)
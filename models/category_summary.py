@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, Date, ForeignKey, UniqueConstraint
+from models import Base
+
+# Income, expense and number of transactions per category and month,
+# maintained by the transaction writes
+class CategorySummary(Base):
+    __tablename__ = "category_summary"
+    __table_args__ = (
+        UniqueConstraint("category_id", "month"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    category_id = Column(Integer, ForeignKey('categories.id'), nullable=True)  # null for uncategorized
+    month = Column(Date, nullable=False, index=True)  # first day of the month
+    # Money columns are in cents
+    income = Column(Integer, default=0, nullable=False)
+    expense = Column(Integer, default=0, nullable=False)
+    count = Column(Integer, default=0, nullable=False)
+
+    def __init__(self, category_id, month):
+        self.category_id = category_id
+        self.month = month
+        self.income = 0
+        self.expense = 0
+        self.count = 0
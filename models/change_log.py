@@ -0,0 +1,80 @@
+from sqlalchemy import Column, String, Integer, UniqueConstraint, text
+from models import Base
+
+# Entities tracked in the change log
+TRANSACTION = "transaction"
+CATEGORY = "category"
+BALANCE = "balance"  # the whole balance history, with entity_id 0
+
+UPSERT = "upsert"
+DELETE = "delete"
+
+
+class ChangeLog(Base):
+    """
+    Latest change of every transaction and category, plus a single entry for
+    the balance history. SQLite triggers replace the entry of a row on every
+    write, giving it the next version, so the greatest version is the data
+    version of the whole database and the entries above a version are the
+    rows changed since then (deleted rows are kept as tombstones).
+    """
+    __tablename__ = "change_log"
+    __table_args__ = (
+        UniqueConstraint("entity", "entity_id"),
+        {"sqlite_autoincrement": True},
+    )
+
+    version = Column(Integer, primary_key=True)
+    entity = Column(String(20), nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    op = Column(String(10), nullable=False)  # upsert or delete
+
+
+def _trigger(table, event, entity, entity_id, op):
+    return f"""
+    CREATE TRIGGER IF NOT EXISTS {table}_changes_{event.lower()} AFTER {event} ON {table} BEGIN
+        INSERT OR REPLACE INTO change_log (entity, entity_id, op) VALUES ('{entity}', {entity_id}, '{op}');
+    END
+    """
+
+
+CHANGE_TRIGGERS_DDL = [
+    _trigger("transactions", "INSERT", TRANSACTION, "new.id", UPSERT),
+    _trigger("transactions", "UPDATE", TRANSACTION, "new.id", UPSERT),
+    _trigger("transactions", "DELETE", TRANSACTION, "old.id", DELETE),
+    _trigger("categories", "INSERT", CATEGORY, "new.id", UPSERT),
+    _trigger("categories", "UPDATE", CATEGORY, "new.id", UPSERT),
+    _trigger("categories", "DELETE", CATEGORY, "old.id", DELETE),
+    _trigger("balance_history", "INSERT", BALANCE, "0", UPSERT),
+    _trigger("balance_history", "UPDATE", BALANCE, "0", UPSERT),
+    _trigger("balance_history", "DELETE", BALANCE, "0", UPSERT),
+    # Transactions embed the name of their category, so renaming it changes
+    # them too and they are logged again for the clients syncing them
+    f"""
+    CREATE TRIGGER IF NOT EXISTS categories_changes_rename AFTER UPDATE OF name ON categories BEGIN
+        INSERT OR REPLACE INTO change_log (entity, entity_id, op)
+        SELECT '{TRANSACTION}', id, '{UPSERT}' FROM transactions WHERE category_id = new.id;
+    END
+    """,
+]
+
+
+def create_change_triggers(engine):
+    """
+    Creates the triggers that fill the change log. When the log is still
+    empty, the existing rows are logged first, so a sync from version 0
+    returns every row.
+    """
+    with engine.begin() as connection:
+        empty = connection.execute(text("SELECT 1 FROM change_log LIMIT 1")).first() is None
+        if empty:
+            connection.execute(text(
+                f"INSERT INTO change_log (entity, entity_id, op) "
+                f"SELECT '{CATEGORY}', id, '{UPSERT}' FROM categories"
+            ))
+            connection.execute(text(
+                f"INSERT INTO change_log (entity, entity_id, op) "
+                f"SELECT '{TRANSACTION}', id, '{UPSERT}' FROM transactions"
+            ))
+        for statement in CHANGE_TRIGGERS_DDL:
+            connection.execute(text(statement))
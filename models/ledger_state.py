@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, Date, text
+from models import Base
+
+
+# Single row (id 1) recording up to which data version the balance history,
+# its monthly rollup and the category summary are known to match the
+# transactions, so a process start can tell whether they must be rebuilt
+class LedgerState(Base):
+    __tablename__ = "ledger_state"
+
+    id = Column(Integer, primary_key=True)
+    # change_log version of the last commit that left the balances consistent
+    version = Column(Integer, default=0, nullable=False)
+    # earliest date written since then whose recalculation is still pending
+    # (background mode only)
+    dirty_from = Column(Date, nullable=True)
+
+
+def create_ledger_state(engine):
+    """Creates the ledger state row, so writes only have to update it."""
+    with engine.begin() as connection:
+        connection.execute(text("INSERT OR IGNORE INTO ledger_state (id, version) VALUES (1, 0)"))
@@ -0,0 +1,139 @@
+import logging
+
+from sqlalchemy import Date, Integer, MetaData, UniqueConstraint, text
+
+logger = logging.getLogger(__name__)
+
+# Columns that used to store money as text or float and now store cents
+MONEY_COLUMNS = {
+    "transactions": ["amount"],
+    "balance_history": ["income", "expense", "balance"],
+}
+
+
+def _columns(connection, table_name):
+    return {
+        row.name: row.type.upper()
+        for row in connection.execute(text(f"PRAGMA table_info({table_name})"))
+    }
+
+
+def _legacy_constraints(connection, table_name):
+    """Returns the NOT NULL columns and the UNIQUE column sets of an existing table."""
+    not_null = {
+        row.name
+        for row in connection.execute(text(f"PRAGMA table_info({table_name})"))
+        if row.notnull
+    }
+    uniques = [
+        tuple(row.name for row in connection.execute(text(f'PRAGMA index_info("{index.name}")')))
+        for index in connection.execute(text(f"PRAGMA index_list({table_name})")).fetchall()
+        if index.origin == "u"
+    ]
+    return not_null, uniques
+
+
+def _with_legacy_constraints(table, not_null, uniques):
+    """
+    Returns a copy of a model table that also has the NOT NULL and UNIQUE
+    constraints of the legacy table, so the rebuild changes the column
+    types only. Databases created by older versions may have constraints
+    the models no longer declare, e.g. UNIQUE (description, category_id) and
+    a NOT NULL category_id on transactions.
+    """
+    # Copied with the whole metadata, so foreign keys still resolve
+    metadata = MetaData()
+    for model_table in table.metadata.sorted_tables:
+        model_table.to_metadata(metadata)
+    rebuilt = metadata.tables[table.name]
+
+    for column in rebuilt.columns:
+        if column.name in not_null:
+            column.nullable = False
+
+    declared = {
+        tuple(column.name for column in constraint.columns)
+        for constraint in list(rebuilt.constraints) + list(rebuilt.indexes)
+        if isinstance(constraint, UniqueConstraint) or getattr(constraint, "unique", False)
+    }
+    for columns in uniques:
+        if columns not in declared and all(name in rebuilt.columns for name in columns):
+            rebuilt.append_constraint(UniqueConstraint(*columns))
+    return rebuilt
+
+
+def _count(connection, table_name):
+    return connection.execute(text(f'SELECT COUNT(*) FROM "{table_name}"')).scalar()
+
+
+def _rebuild_table(connection, table, converted):
+    """
+    Recreates a table from its model definition, keeping the constraints of
+    the legacy table, and copies the rows over, converting values with the
+    SQL expressions in converted (by column name). SQLite cannot change the
+    type of a column in place.
+    """
+    legacy = f"_{table.name}_legacy"
+    legacy_columns = _columns(connection, table.name)
+    rebuilt = _with_legacy_constraints(table, *_legacy_constraints(connection, table.name))
+    rows = _count(connection, table.name)
+    logger.info("Convertendo %s para centavos: %d linhas", table.name, rows)
+
+    # Indexes keep their names when a table is renamed and would clash with
+    # the ones created with the new table
+    for index in connection.execute(text(f"PRAGMA index_list({table.name})")).fetchall():
+        if index.origin == "c":
+            connection.execute(text(f'DROP INDEX "{index.name}"'))
+
+    connection.execute(text(f'ALTER TABLE "{table.name}" RENAME TO "{legacy}"'))
+    rebuilt.create(connection)
+
+    columns = [column.name for column in table.columns if column.name in legacy_columns]
+    values = [converted.get(name, f'"{name}"') for name in columns]
+    connection.execute(text(
+        f'INSERT INTO "{table.name}" ({", ".join(columns)}) '
+        f'SELECT {", ".join(values)} FROM "{legacy}"'
+    ))
+    copied = _count(connection, table.name)
+    logger.info("%s convertida: %d de %d linhas copiadas", table.name, copied, rows)
+    if copied != rows:
+        # Rolls back the whole migration, leaving the legacy tables in place
+        raise RuntimeError(f"A conversão de {table.name} copiou {copied} de {rows} linhas")
+    connection.execute(text(f'DROP TABLE "{legacy}"'))
+
+
+def migrate_money_to_cents(engine, metadata):
+    """
+    Converts the money columns of databases created before money was stored
+    as integer cents. Values are rounded to cents, which is lossless for the
+    amounts accepted by the API. Dates are normalized to YYYY-MM-DD on the way.
+
+    Triggers are dropped, since renaming the tables would rewrite them to point
+    to the legacy tables; they are recreated at startup after the migration.
+    """
+    with engine.begin() as connection:
+        pending = [
+            metadata.tables[table_name]
+            for table_name, money_columns in MONEY_COLUMNS.items()
+            if any(
+                _columns(connection, table_name).get(name, "INTEGER") != "INTEGER"
+                for name in money_columns
+            )
+        ]
+        if not pending:
+            return
+
+        triggers = connection.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger'"
+        )).fetchall()
+        for trigger in triggers:
+            connection.execute(text(f'DROP TRIGGER "{trigger.name}"'))
+
+        for table in pending:
+            converted = {
+                name: f'CAST(ROUND("{name}" * 100) AS INTEGER)' for name in MONEY_COLUMNS[table.name]
+            }
+            for column in table.columns:
+                if isinstance(column.type, Date):
+                    converted[column.name] = f'date("{column.name}")'
+            _rebuild_table(connection, table, converted)
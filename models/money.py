@@ -0,0 +1,20 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+# Money is stored as an integer number of cents. Conversion from and to
+# Decimal only happens at the API boundary, with these helpers.
+CENT = Decimal('0.01')
+
+
+def to_cents(value):
+    """Converts a money value (Decimal, float, int or string) to integer cents."""
+    return int(Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_UP) * 100)
+
+
+def from_cents(cents):
+    """Converts integer cents to a Decimal with two decimal places."""
+    return Decimal(cents).scaleb(-2)
+
+
+def format_cents(cents):
+    """Formats integer cents as a decimal string, e.g. 1050 -> '10.50'."""
+    return str(from_cents(cents))
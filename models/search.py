@@ -0,0 +1,76 @@
+from sqlalchemy import Table, Column, Integer, String, MetaData, text
+from sqlalchemy.exc import OperationalError
+
+# Full text index of the transactions description and category name. It is a
+# SQLite FTS5 virtual table, so it lives in its own metadata and is created
+# by create_search_index instead of Base.metadata.create_all.
+search_metadata = MetaData()
+
+transactions_fts = Table(
+    "transactions_fts", search_metadata,
+    Column("rowid", Integer, primary_key=True),  # same as transactions.id
+    Column("description", String),
+    Column("category", String),
+    Column("rank"),
+)
+
+SEARCH_INDEX_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts
+    USING fts5(description, category, tokenize = 'unicode61 remove_diacritics 2')
+    """,
+    # Keep the index in sync with every write on transactions, including
+    # bulk inserts that do not go through the ORM
+    """
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_insert AFTER INSERT ON transactions BEGIN
+        INSERT INTO transactions_fts (rowid, description, category)
+        VALUES (new.id, new.description, (SELECT name FROM categories WHERE id = new.category_id));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_delete AFTER DELETE ON transactions BEGIN
+        DELETE FROM transactions_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_update
+    AFTER UPDATE OF description, category_id ON transactions BEGIN
+        UPDATE transactions_fts
+        SET description = new.description,
+            category = (SELECT name FROM categories WHERE id = new.category_id)
+        WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS categories_fts_update AFTER UPDATE OF name ON categories BEGIN
+        UPDATE transactions_fts SET category = new.name
+        WHERE rowid IN (SELECT id FROM transactions WHERE category_id = new.id);
+    END
+    """,
+]
+
+REBUILD_SEARCH_INDEX = """
+    INSERT INTO transactions_fts (rowid, description, category)
+    SELECT transactions.id, transactions.description, categories.name
+    FROM transactions LEFT JOIN categories ON categories.id = transactions.category_id
+"""
+
+
+def create_search_index(engine):
+    """
+    Creates the full text index and its triggers, filling it with the existing
+    transactions when it is created. Returns False if the SQLite build has no
+    FTS5 support, in which case searches fall back to LIKE.
+    """
+    try:
+        with engine.begin() as connection:
+            exists = connection.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'transactions_fts'"
+            )).first() is not None
+            for statement in SEARCH_INDEX_DDL:
+                connection.execute(text(statement))
+            if not exists:
+                connection.execute(text(REBUILD_SEARCH_INDEX))
+        return True
+    except OperationalError:
+        return False
@@ -1,22 +1,32 @@
-from sqlalchemy import Column, String, Integer, Date, Numeric, UniqueConstraint, ForeignKey
+from sqlalchemy import Column, String, Integer, Date, Numeric, UniqueConstraint, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import date, datetime
 from typing import Union
 from decimal import Decimal
 
 from models import Base
+from models.money import to_cents, from_cents, format_cents
 
 
 class Transaction(Base):
     __tablename__ = 'transactions'
     id = Column(Integer, primary_key=True)
     description = Column(String(140))
-    amount = Column(String(20), nullable=False)
+    amount = Column(Integer, nullable=False)  # in cents
     category_id = Column(Integer, ForeignKey('categories.id'), nullable=True)
     category = relationship("Category")
     date = Column(Date, default=date.today)
     type = Column(String(10), nullable=False, default="income")  # income or expense
 
+    # Composite indexes matching the keyset order of the listing (date desc,
+    # id desc), alone or after an equality filter on type or category
+    __table_args__ = (
+        Index('ix_transactions_date_id', 'date', 'id'),
+        Index('ix_transactions_type_date_id', 'type', 'date', 'id'),
+        Index('ix_transactions_category_date_id', 'category_id', 'date', 'id'),
+        Index('ix_transactions_amount', 'amount'),
+    )
+
 
     def __init__(self, description, amount, date, type, category=None):
         """
@@ -24,13 +34,13 @@ class Transaction(Base):
 
         Arguments:
             description: transaction description.
-            amount: transaction value
+            amount: transaction value (stored in cents)
             date: transaction date (date object or YYYY-MM-DD string)
             type: transaction type (income or expense)
             category: Category object (optional)
         """
         self.description = description
-        self.amount = str(Decimal(str(amount)))
+        self.amount = to_cents(amount)
         self.category = category
         self.category_id = category.id if category else None
         if isinstance(date, str):
@@ -43,7 +53,7 @@ class Transaction(Base):
 
     def get_amount(self):
         """Returns the amount as a Decimal object"""
-        return Decimal(self.amount)
+        return from_cents(self.amount)
 
     def to_dict(self):
         """
@@ -52,12 +62,46 @@ class Transaction(Base):
         return{
             "id": self.id,
             "description": self.description,
-            "amount": self.amount,
+            "amount": format_cents(self.amount),
             "category": self.category.to_dict() if self.category else None,
             "date": self.date.strftime('%Y-%m-%d'),
             "type": self.type
         }
 
+    @staticmethod
+    def query_rows(session):
+        """
+        Returns a query of the listing columns of the transactions joined with
+        their category, as plain row tuples to be serialized with row_to_dict.
+        No Transaction object is hydrated and the category comes from the same
+        SELECT, avoiding one extra query per row.
+        """
+        from models.category import Category
+
+        return session.query(
+            Transaction.id,
+            Transaction.description,
+            Transaction.amount,
+            Transaction.date,
+            Transaction.type,
+            Category.id.label("category_id"),
+            Category.name.label("category_name")
+        ).outerjoin(Category, Transaction.category_id == Category.id)
+
+    @staticmethod
+    def row_to_dict(row):
+        """
+        Returns the same dictionary as to_dict for a row of query_rows.
+        """
+        return {
+            "id": row.id,
+            "description": row.description,
+            "amount": format_cents(row.amount),
+            "category": {"id": row.category_id, "name": row.category_name} if row.category_id is not None else None,
+            "date": row.date.strftime('%Y-%m-%d'),
+            "type": row.type
+        }
+
     def __repr__(self):
         """
         Returns a text representation of the Transaction object.
@@ -1,13 +1,25 @@
 from schemas.error import ErrorSchema
 from schemas.category import (
     CategoryDeletePathSchema, CategoryBodySchema, CategoryViewSchema, CategoryListResponse,
-    CategorySearchByIdPathSchema, CategoryUpdatePathSchema, CategoryUpdateBodySchema, CategoryUpdateResponse
+    CategorySearchByIdPathSchema, CategoryUpdatePathSchema, CategoryUpdateBodySchema, CategoryUpdateResponse,
+    CategorySummaryQuery, CategorySummarySchema, CategorySummaryResponse
 )
 from schemas.transaction import (
     TransactionSchema, TransactionViewSchema, TransactionSearchByIdSchema, TransactionSearchByDescriptionSchema,
     TransactionDeleteSchema, TransactionSearchQuery, TransactionListResponse, TransactionUpdatePathSchema,
-    TransactionUpdateBodySchema, TransactionUpdateResponse, TransactionSearchByIdPathSchema, TransactionDeletePathSchema
+    TransactionUpdateBodySchema, TransactionUpdateResponse, TransactionSearchByIdPathSchema, TransactionDeletePathSchema,
+    TransactionBulkQuery, TransactionBulkError, TransactionBulkResponse, TransactionListQuery,
+    TransactionPageResponse, TransactionSearchResponse, TransactionChangesQuery, TransactionChangeSchema,
+    TransactionChangesResponse, TransactionBatchOperation, TransactionBatchSchema, TransactionBatchResult,
+    TransactionBatchResponse
 )
 from schemas.balance import (
-    BalanceSchema, BalanceViewSchema, BalanceListResponse, BalanceCurrentResponse
-)
\ No newline at end of file
+    BalanceSchema, BalanceViewSchema, BalanceListResponse, BalanceCurrentResponse, BalanceListQuery,
+    BalanceStatusResponse, BalanceRecalculateQuery, BalanceRecalculateResponse, BalanceAtQuery, BalanceAtSchema, BalanceAtBatchSchema, BalanceAtBatchResponse
+)
+from schemas.admin import CacheStatsResponse, SlowQuerySchema, SlowQueriesResponse
+from schemas.analytics import (
+    AnalyticsPeriodQuery, RollingAverageQuery, RollingAverageSchema, RollingAverageResponse,
+    MonthlyPercentilesQuery, MonthlyPercentilesSchema, MonthlyPercentilesResponse, TopCategoriesQuery,
+    TopCategorySchema, TopCategoriesResponse
+)
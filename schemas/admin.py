@@ -0,0 +1,37 @@
+from typing import List, Optional, Union
+
+from pydantic import BaseModel
+
+
+class CacheStatsResponse(BaseModel):
+    """ Defines the counters and settings of the read cache.
+    """
+    hits: int
+    misses: int
+    entries: int
+    max_entries: int
+    ttl: float
+
+
+class SlowQuerySchema(BaseModel):
+    """ Defines a statement recorded by the slow query log. route is the
+        route of the request that ran it (null outside of requests), and
+        plan is the EXPLAIN QUERY PLAN output of the statement.
+    """
+    sql: str
+    parameters: List[Union[int, float, str, None]]
+    executemany_rows: Optional[int]
+    duration_ms: float
+    route: Optional[str]
+    path: Optional[str]
+    at: str
+    plan: List[str]
+
+
+class SlowQueriesResponse(BaseModel):
+    """ Defines the slow query log, the newest statements first. It is only
+        enabled when MYBALANCE_SLOW_QUERY_MS is set.
+    """
+    enabled: bool
+    threshold_ms: float
+    queries: List[SlowQuerySchema]
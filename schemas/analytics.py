@@ -0,0 +1,80 @@
+from typing import Dict, List, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+from schemas.category import CategoryViewSchema
+
+
+class AnalyticsPeriodQuery(BaseModel):
+    """ Defines the period (YYYY-MM-DD, inclusive) of an analysis. By default
+        it covers the whole ledger.
+    """
+    date_from: Optional[str] = Field(None, alias="from")
+    date_to: Optional[str] = Field(None, alias="to")
+
+
+class RollingAverageQuery(AnalyticsPeriodQuery):
+    """ Defines the amounts (income, expense or net) averaged over the last
+        window days.
+    """
+    window: int = Field(30, ge=1, le=366)
+    type: Literal["income", "expense", "net"] = "net"
+
+
+class RollingAverageSchema(BaseModel):
+    """ Defines the total of a day, its moving average and the balance of the
+        ledger at the end of the day.
+    """
+    date: str
+    amount: str
+    average: str
+    balance: str
+
+
+class RollingAverageResponse(BaseModel):
+    window: int
+    type: str
+    days: List[RollingAverageSchema]
+
+
+class MonthlyPercentilesQuery(AnalyticsPeriodQuery):
+    """ Defines the percentiles (comma separated, between 0 and 100) of the
+        transaction amounts of each month.
+    """
+    percentiles: str = "50,90,99"
+    type: Literal["income", "expense"] = "expense"
+
+
+class MonthlyPercentilesSchema(BaseModel):
+    """ Defines the percentiles of a month, keyed by percentile.
+    """
+    month: str
+    count: int
+    total: str
+    percentiles: Dict[str, str]
+
+
+class MonthlyPercentilesResponse(BaseModel):
+    type: str
+    months: List[MonthlyPercentilesSchema]
+
+
+class TopCategoriesQuery(AnalyticsPeriodQuery):
+    limit: int = Field(5, ge=1, le=100)
+    type: Literal["income", "expense"] = "expense"
+
+
+class TopCategorySchema(BaseModel):
+    """ Defines the total of a category in the period and its share of the
+        total of all categories. category is null for transactions without
+        category.
+    """
+    category: Optional[CategoryViewSchema]
+    total: str
+    count: int
+    share: float
+
+
+class TopCategoriesResponse(BaseModel):
+    type: str
+    categories: List[TopCategorySchema]
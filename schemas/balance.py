@@ -1,6 +1,6 @@
-from pydantic import BaseModel, condecimal
+from pydantic import BaseModel, Field, condecimal
 from decimal import Decimal
-from typing import List
+from typing import List, Literal, Optional
 
 class BalanceSchema(BaseModel):
     date: str
@@ -19,7 +19,60 @@ class BalanceViewSchema(BalanceSchema):
 class BalanceListResponse(BaseModel):
     balances: List[BalanceViewSchema]
 
+class BalanceListQuery(BaseModel):
+    """ Defines the period and resolution of the balance history. Week and
+        month buckets cover the whole periods overlapping from/to.
+    """
+    date_from: Optional[str] = Field(None, alias="from")  # Format: YYYY-MM-DD
+    date_to: Optional[str] = Field(None, alias="to")  # Format: YYYY-MM-DD
+    granularity: Literal["day", "week", "month"] = "day"
+    stream: bool = False
+
 class BalanceCurrentResponse(BaseModel):
     balance: str
     income: str
     expense: str
+    current: bool  # false while a background recalculation is pending
+
+class BalanceRecalculateQuery(BaseModel):
+    """ Defines whether the recalculation is handed to the recalculation
+        worker (async=true) instead of running in the request.
+    """
+    run_async: bool = Field(False, alias="async")
+
+class BalanceRecalculateResponse(BaseModel):
+    message: str
+
+class BalanceStatusResponse(BaseModel):
+    """ Defines the state of the balance recalculation. In the background
+        mode, balances are current once applied_version reaches
+        requested_version.
+    """
+    mode: Literal["incremental", "background"]
+    current: bool
+    requested_version: int
+    applied_version: int
+    dirty_from: Optional[str]
+    last_error: Optional[str]
+
+class BalanceAtQuery(BaseModel):
+    """ Defines the day (YYYY-MM-DD) whose closing balance is requested.
+    """
+    date: str
+
+class BalanceAtSchema(BaseModel):
+    """ Defines the balance at the end of a day. as_of is the date of the
+        history record it comes from, the latest on or before date; it is
+        null for days before the first record, whose balance is zero.
+    """
+    date: str
+    balance: str
+    as_of: Optional[str]
+
+class BalanceAtBatchSchema(BaseModel):
+    """ Defines the days (YYYY-MM-DD) whose closing balances are requested.
+    """
+    dates: List[str] = Field(..., min_items=1, max_items=1000)
+
+class BalanceAtBatchResponse(BaseModel):
+    balances: List[BalanceAtSchema]
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, Field
+from typing import List, Optional
 
 class CategoryViewSchema(BaseModel):
     """ Defines the structure of the category to be returned.
@@ -31,3 +31,23 @@ class CategoryUpdateResponse(BaseModel):
 
 class CategorySearchByIdPathSchema(BaseModel):
     id: int
+
+class CategorySummaryQuery(BaseModel):
+    """ Defines the months (YYYY-MM, inclusive) and the category of the summary.
+    """
+    month_from: Optional[str] = Field(None, alias="from")
+    month_to: Optional[str] = Field(None, alias="to")
+    category_id: Optional[int] = None
+
+class CategorySummarySchema(BaseModel):
+    """ Defines the totals of a category in a month. category is null for
+        transactions without category.
+    """
+    category: Optional[CategoryViewSchema]
+    month: str
+    income: str
+    expense: str
+    count: int
+
+class CategorySummaryResponse(BaseModel):
+    summary: List[CategorySummarySchema]
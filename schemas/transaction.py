@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List, Literal
 from models.transaction import Transaction
 
@@ -23,7 +23,27 @@ class TransactionSearchByDescriptionSchema(BaseModel):
     term: str
     
 class TransactionSearchQuery(BaseModel):
+    """ Defines the search terms and the pagination of the results, which
+        are ordered by relevance.
+    """
     term: str
+    limit: Optional[int] = Field(None, ge=1, le=500)  # 50 when not streaming
+    offset: int = Field(0, ge=0)
+    stream: bool = False
+
+class TransactionListQuery(BaseModel):
+    """ Defines the pagination and filters of the transaction listing.
+        The cursor is the next_cursor returned by the previous page.
+    """
+    limit: Optional[int] = Field(None, ge=1, le=500)  # 50 when not streaming
+    cursor: Optional[str] = None
+    date_from: Optional[str] = None  # Format: YYYY-MM-DD
+    date_to: Optional[str] = None  # Format: YYYY-MM-DD
+    type: Optional[Literal[TransactionType.INCOME, TransactionType.EXPENSE]] = None
+    category_id: Optional[int] = None
+    amount_min: Optional[float] = None
+    amount_max: Optional[float] = None
+    stream: bool = False
 
 class TransactionSearchByIdSchema(BaseModel):
     """ Defines the structure of the search. Which will be
@@ -52,6 +72,41 @@ class TransactionListResponse(BaseModel):
     """
     transactions: List[TransactionViewSchema]
 
+class TransactionPageResponse(TransactionListResponse):
+    """ Defines the structure of a page of the transaction listing.
+        next_cursor is null on the last page.
+    """
+    next_cursor: Optional[str]
+
+class TransactionSearchResponse(TransactionListResponse):
+    """ Defines the structure of a page of search results.
+        next_offset is null on the last page.
+    """
+    next_offset: Optional[int]
+
+class TransactionChangesQuery(BaseModel):
+    """ Defines the sync feed parameters: the version of the last sync
+        (0 for everything) and the maximum number of changes returned.
+    """
+    since: int = Field(0, ge=0)
+    limit: int = Field(500, ge=1, le=1000)
+
+class TransactionChangeSchema(BaseModel):
+    """ Defines a change of the sync feed. transaction is null for deletions.
+    """
+    version: int
+    op: Literal["upsert", "delete"]
+    id: int
+    transaction: Optional[TransactionViewSchema]
+
+class TransactionChangesResponse(BaseModel):
+    """ Defines a page of the sync feed. version is the since of the next
+        call, and has_more tells whether it already has more changes.
+    """
+    version: int
+    has_more: bool
+    changes: List[TransactionChangeSchema]
+
 class TransactionUpdatePathSchema(BaseModel):
     """ Defines the path parameters for updating a transaction.
     """
@@ -84,4 +139,50 @@ class TransactionSearchByIdPathSchema(BaseModel):
 class TransactionDeletePathSchema(BaseModel):
     """ Defines the path parameters for deleting a transaction.
     """
-    id: int
\ No newline at end of file
+    id: int
+
+class TransactionBulkQuery(BaseModel):
+    """ Defines the query parameters of a bulk import. The format is taken
+        from the Content-Type header when not given.
+    """
+    format: Optional[Literal["csv", "ndjson"]] = None
+
+class TransactionBulkError(BaseModel):
+    """ Defines an error of a row rejected by a bulk import.
+    """
+    row: int
+    message: str
+
+class TransactionBulkResponse(BaseModel):
+    """ Defines the summary returned by a bulk import.
+    """
+    received: int
+    inserted: int
+    failed: int
+    errors: List[TransactionBulkError]
+
+class TransactionBatchOperation(BaseModel):
+    """ Defines an operation of a batch. create takes the transaction,
+        update takes the id and the transaction, and delete only the id.
+    """
+    op: Literal["create", "update", "delete"]
+    id: Optional[int] = None
+    transaction: Optional[TransactionSchema] = None
+
+class TransactionBatchSchema(BaseModel):
+    """ Defines a batch of operations, applied in order and all together.
+    """
+    operations: List[TransactionBatchOperation] = Field(..., min_items=1, max_items=1000)
+
+class TransactionBatchResult(BaseModel):
+    """ Defines the result of an operation of a batch. transaction is null
+        for deletions.
+    """
+    op: str
+    id: int
+    transaction: Optional[TransactionViewSchema]
+
+class TransactionBatchResponse(BaseModel):
+    """ Defines the results of a batch, in the order of its operations.
+    """
+    results: List[TransactionBatchResult]
@@ -0,0 +1,94 @@
+import threading
+
+from flask import current_app, g, request
+from werkzeug.exceptions import NotFound
+
+from models import Session
+from models.accounts import DEFAULT_ACCOUNT, current_account, valid_account
+from services.consistency import ensure_consistent
+
+# Requests choose their account with this header or with the path prefix
+# /accounts/<account>/...; without either they use the default account
+ACCOUNT_HEADER = "X-Account"
+ACCOUNT_PREFIX = "/accounts/"
+
+# Accounts whose balances were checked by this process, and the locks of
+# the checks still running, one per account
+_checked = set()
+_check_locks = {}
+_check_locks_lock = threading.Lock()
+
+
+class AccountPrefixMiddleware:
+    """
+    WSGI middleware routing /accounts/<account>/<path> to /<path> of that
+    account. The prefix is moved to SCRIPT_NAME, so the routes are the same
+    for every account and url_for keeps the prefix.
+    """
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO", "")
+        if path.startswith(ACCOUNT_PREFIX):
+            account, _, rest = path[len(ACCOUNT_PREFIX):].partition("/")
+            if not account:
+                # /accounts//... names no account; it must not fall back to
+                # the default one
+                return NotFound()(environ, start_response)
+            environ["HTTP_X_ACCOUNT"] = account
+            environ["SCRIPT_NAME"] = environ.get("SCRIPT_NAME", "") + ACCOUNT_PREFIX + account
+            environ["PATH_INFO"] = "/" + rest
+        return self.wsgi_app(environ, start_response)
+
+
+def ensure_checked(account):
+    """
+    Checks the balances of account the first time it is used by this
+    process; the balances are only rebuilt when the watermark shows they
+    may be out of date, so restarting a worker does not replay the ledgers.
+
+    Concurrent first requests of an account wait for a single check, while
+    the other accounts are not held up by it (a check may be a full rebuild).
+    """
+    if account in _checked:
+        return
+    with _check_locks_lock:
+        lock = _check_locks.setdefault(account, threading.Lock())
+
+    with lock:
+        if account in _checked:
+            return
+        session = Session(account=account, write=True)
+        try:
+            result = ensure_consistent(session)
+            current_app.logger.info("Saldos da conta %s: %s", account, result)
+        finally:
+            session.close()
+        _checked.add(account)
+
+    # Later requests return before taking a lock
+    with _check_locks_lock:
+        _check_locks.pop(account, None)
+
+
+def _select_account():
+    account = request.headers.get(ACCOUNT_HEADER) or DEFAULT_ACCOUNT
+    if not valid_account(account):
+        return {"message": "Conta inválida: use até 64 letras, números, _ ou -"}, 400
+    g.account_token = current_account.set(account)
+    ensure_checked(account)
+
+
+def _reset_account(exception):
+    token = g.pop("account_token", None)
+    if token is not None:
+        current_account.reset(token)
+
+
+def init_app(app):
+    """Routes the requests of app to the database of their account."""
+    app.wsgi_app = AccountPrefixMiddleware(app.wsgi_app)
+    app.before_request(_select_account)
+    app.teardown_request(_reset_account)
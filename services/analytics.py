@@ -0,0 +1,265 @@
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import NamedTuple
+
+from sqlalchemy import bindparam, text
+
+# NumPy is optional: without it the analytics endpoints answer 503
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from models import max_open_accounts
+from models.change_log import TRANSACTION, DELETE
+from schemas.transaction import TransactionType
+from services.sync import data_version
+
+numpy_enabled = np is not None
+
+INCOME = "income"
+EXPENSE = "expense"
+NET = "net"
+
+# Dates are kept as days since 1970-01-01, the unit of datetime64[D]
+EPOCH = date(1970, 1, 1).toordinal()
+
+# Changes since the last refresh beyond this share of the ledger rebuild the
+# snapshot, instead of patching it
+REBUILD_SHARE = 0.25
+# Ids per IN (...) when loading changed transactions
+LOAD_CHUNK = 500
+
+# The columns are computed by SQLite: days since the epoch, amounts signed by
+# type and -1 for transactions without category
+SELECT_COLUMNS = """
+    SELECT id,
+           CAST(julianday(date) - 2440587.5 AS INTEGER),
+           CASE WHEN type = :income THEN amount ELSE -amount END,
+           COALESCE(category_id, -1)
+    FROM transactions
+"""
+LOAD_ALL = SELECT_COLUMNS + " ORDER BY id"
+LOAD_CHANGED = text(SELECT_COLUMNS + " WHERE id IN :ids").bindparams(bindparam("ids", expanding=True))
+CHANGED_TRANSACTIONS = text("""
+    SELECT entity_id, op FROM change_log
+    WHERE entity = :entity AND version > :since AND version <= :version
+""")
+
+
+class LedgerColumns(NamedTuple):
+    """Column arrays of the transactions, sorted by id. Never changed in place."""
+    ids: "np.ndarray"
+    days: "np.ndarray"  # days since 1970-01-01
+    amounts: "np.ndarray"  # in cents, positive for income and negative for expense
+    categories: "np.ndarray"  # category id, -1 without category
+
+
+def _to_columns(rows):
+    array = np.array(rows, dtype=np.int64).reshape(-1, 4)
+    return LedgerColumns(array[:, 0].copy(), array[:, 1].copy(), array[:, 2].copy(), array[:, 3].copy())
+
+
+class LedgerSnapshot:
+    """
+    Columnar copy of the transactions of one database, for analytics.
+
+    It is built once and then brought up to date on use from the change log:
+    only the transactions written since the version of the snapshot are
+    loaded again, and deleted ones are dropped.
+    """
+
+    def __init__(self):
+        self.columns = None
+        self.version = None
+        self._lock = threading.Lock()
+
+    def get(self, session):
+        """Returns the columns, refreshed up to the current data version."""
+        with self._lock:
+            version = data_version(session)
+            if self.columns is None:
+                self._build(session, version)
+            elif version != self.version:
+                self._refresh(session, version)
+            return self.columns
+
+    def _build(self, session, version):
+        # Read with the DBAPI cursor of the session connection: plain tuples
+        # load into arrays several times faster than SQLAlchemy rows
+        cursor = session.connection().connection.cursor()
+        try:
+            rows = cursor.execute(LOAD_ALL, {"income": TransactionType.INCOME}).fetchall()
+        finally:
+            cursor.close()
+        self.columns = _to_columns(rows)
+        self.version = version
+
+    def _refresh(self, session, version):
+        changes = session.execute(CHANGED_TRANSACTIONS, {
+            "entity": TRANSACTION, "since": self.version, "version": version
+        }).fetchall()
+        if len(changes) > max(LOAD_CHUNK, REBUILD_SHARE * len(self.columns.ids)):
+            self._build(session, version)
+            return
+
+        upserted = [entity_id for entity_id, op in changes if op != DELETE]
+        rows = []
+        for start in range(0, len(upserted), LOAD_CHUNK):
+            chunk = upserted[start:start + LOAD_CHUNK]
+            rows.extend(session.execute(LOAD_CHANGED, {"income": TransactionType.INCOME, "ids": chunk}))
+
+        # Every changed row is dropped, and the upserted ones added again
+        columns = self.columns
+        keep = ~np.isin(columns.ids, [entity_id for entity_id, _ in changes])
+        changed = _to_columns(rows)
+        merged = [np.concatenate((column[keep], new)) for column, new in zip(columns, changed)]
+        order = np.argsort(merged[0], kind="stable")
+        self.columns = LedgerColumns(*(column[order] for column in merged))
+        self.version = version
+
+
+_snapshots = OrderedDict()
+_snapshots_lock = threading.Lock()
+
+
+def ledger_columns(session):
+    """
+    Returns the columns of the transactions of the session account. The
+    snapshots of the most recently used accounts are kept in memory.
+    """
+    with _snapshots_lock:
+        snapshot = _snapshots.get(session.account)
+        if snapshot is None:
+            snapshot = _snapshots[session.account] = LedgerSnapshot()
+            while len(_snapshots) > max_open_accounts + 1:
+                _snapshots.popitem(last=False)
+        else:
+            _snapshots.move_to_end(session.account)
+    return snapshot.get(session)
+
+
+def to_day(value):
+    return value.toordinal() - EPOCH
+
+
+def from_day(day):
+    return date.fromordinal(int(day) + EPOCH)
+
+
+def round_cents(values):
+    """Rounds fractional cents to the nearest cent, as Python ints."""
+    return np.rint(values).astype(np.int64).tolist()
+
+
+def _period(columns, start, end):
+    """Days of the period: the dates given or, by default, those of the first and last transactions."""
+    start = to_day(start) if start else int(columns.days.min())
+    end = to_day(end) if end else int(columns.days.max())
+    return start, end
+
+
+def _select(columns, kind, mask):
+    """Returns the amounts of kind (positive) and the mask of the transactions selected."""
+    amounts = columns.amounts
+    if kind == INCOME:
+        mask = mask & (amounts > 0)
+    elif kind == EXPENSE:
+        mask = mask & (amounts < 0)
+        amounts = -amounts
+    return amounts[mask], mask
+
+
+def _sum_by(indexes, weights, size):
+    # float64 sums of cents are exact up to 2**53 cents
+    return np.rint(np.bincount(indexes, weights=weights, minlength=size)).astype(np.int64)
+
+
+def rolling_average(columns, start, end, window, kind=NET):
+    """
+    Daily totals of kind in [start, end] (limited to the days of the
+    ledger), with their average over the last window days (days without
+    transactions count as zero) and the running balance of the ledger at the
+    end of each day.
+
+    Returns (days, totals, averages, balances), averages in fractional cents.
+    """
+    if len(columns.ids) == 0:
+        return [np.empty(0, dtype=np.int64)] * 4
+    # Days outside the ledger are left out
+    start, end = _period(columns, start, end)
+    start, end = max(start, int(columns.days.min())), min(end, int(columns.days.max()))
+    if end < start:
+        return [np.empty(0, dtype=np.int64)] * 4
+
+    # The window of the first day starts before the period
+    first = start - window + 1
+    days = columns.days
+    in_range = (days >= first) & (days <= end)
+    values, mask = _select(columns, kind, in_range)
+    totals = _sum_by(days[mask] - first, values, end - first + 1)
+    sums = np.concatenate(([0], np.cumsum(totals)))
+    averages = (sums[window:] - sums[:-window]) / window
+
+    net = _sum_by(days[in_range] - first, columns.amounts[in_range], end - first + 1)[window - 1:]
+    opening = int(columns.amounts[days < start].sum())
+    balances = opening + np.cumsum(net)
+
+    return np.arange(start, end + 1), totals[window - 1:], averages, balances
+
+
+def monthly_percentiles(columns, start, end, percentiles, kind=EXPENSE):
+    """
+    Percentiles (linear interpolation, like numpy.percentile) of the amounts
+    of kind of each month in [start, end], computed for every month at once.
+
+    Returns (months, counts, totals, values), values with one row per month
+    and one column per percentile.
+    """
+    empty = np.empty(0, dtype=np.int64)
+    if len(columns.ids) == 0:
+        return empty, empty, empty, np.empty((0, len(percentiles)))
+    start, end = _period(columns, start, end)
+
+    days = columns.days
+    values, mask = _select(columns, kind, (days >= start) & (days <= end))
+    months = days[mask].astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+
+    # Sorted by month, then amount, so each month is a sorted slice
+    order = np.lexsort((values, months))
+    values, months = values[order], months[order]
+    month_values, firsts, counts = np.unique(months, return_index=True, return_counts=True)
+    totals = np.add.reduceat(values, firsts) if len(values) else empty
+
+    positions = (counts[:, None] - 1) * (np.asarray(percentiles, dtype=np.float64)[None, :] / 100)
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.minimum(lower + 1, counts[:, None] - 1)
+    low_values = values[firsts[:, None] + lower]
+    high_values = values[firsts[:, None] + upper]
+    result = low_values + (high_values - low_values) * (positions - lower)
+
+    return month_values.astype("datetime64[M]"), counts, totals, result
+
+
+def top_categories(columns, start, end, limit, kind=EXPENSE):
+    """
+    Categories with the greatest totals of kind in [start, end], as
+    (category ids, totals, counts, shares of the total); -1 stands for the
+    transactions without category.
+    """
+    empty = np.empty(0, dtype=np.int64)
+    if len(columns.ids) == 0:
+        return empty, empty, empty, np.empty(0)
+    start, end = _period(columns, start, end)
+
+    days = columns.days
+    values, mask = _select(columns, kind, (days >= start) & (days <= end))
+    category_ids, indexes = np.unique(columns.categories[mask], return_inverse=True)
+    totals = _sum_by(indexes, values, len(category_ids))
+    counts = np.bincount(indexes, minlength=len(category_ids))
+
+    order = np.argsort(-totals, kind="stable")[:limit]
+    overall = totals.sum()
+    shares = totals[order] / overall if overall else np.zeros(len(order))
+    return category_ids[order], totals[order], counts[order], shares
@@ -1,54 +1,290 @@
-from sqlalchemy.sql import func
-from sqlalchemy.types import String
-from models.transaction import Transaction
+from bisect import bisect_right
+from sqlalchemy.sql import text
 from models.balance_history import BalanceHistory
-from datetime import date, datetime
+from models.balance_monthly import BalanceMonthly
+from datetime import date, timedelta
 from schemas.transaction import TransactionType
-from decimal import Decimal
+from typing import NamedTuple, Optional
+from services.cache import invalidate_on_commit, BALANCE
+from services.category_summary import rebuild_category_summary
+from services import recalculation, consistency
+from services.metrics import timed, balance_rebuild_duration
+
+
+class LedgerEntry(NamedTuple):
+    """Snapshot of the fields of a transaction that affect the balance.
+
+    Taken before a transaction is changed or deleted, so its previous
+    contribution can be reverted once the session has been flushed.
+    """
+    date: date
+    amount: int  # in cents
+    type: str
+    category_id: Optional[int]
+
+    @classmethod
+    def of(cls, transaction):
+        return cls(
+            date=transaction.date,
+            amount=transaction.amount,
+            type=transaction.type,
+            category_id=transaction.category_id
+        )
+
+
+# Daily totals and running balance computed inside SQLite, from a start
+# date on, continuing from the opening balance of that date
+REBUILD_BALANCE_HISTORY = text("""
+    INSERT INTO balance_history (date, income, expense, balance)
+    SELECT date, income, expense, :opening + SUM(income - expense) OVER (ORDER BY date)
+    FROM (
+        SELECT date,
+               SUM(CASE WHEN type = :income THEN amount ELSE 0 END) AS income,
+               SUM(CASE WHEN type = :income THEN 0 ELSE amount END) AS expense
+        FROM transactions
+        WHERE date >= :start
+        GROUP BY date
+    )
+    ORDER BY date
+""")
+
+
+# Adds the totals of a day to its history row, summing on the current
+# values inside SQLite instead of values read earlier by the application.
+# Not an INSERT ... ON CONFLICT DO UPDATE: its update would make the
+# INSERT OR REPLACE of the change log triggers fail
+ADD_TO_BALANCE_DAY = text("""
+    UPDATE balance_history
+    SET income = income + :income, expense = expense + :expense, balance = balance + :net
+    WHERE date = :day
+""")
+
+# Creates the row of a new day, opening with the balance of the closest
+# previous day. Write sessions hold the write lock, so no other request
+# creates it in between
+INSERT_BALANCE_DAY = text("""
+    INSERT INTO balance_history (date, income, expense, balance)
+    VALUES (:day, :income, :expense, :net + COALESCE(
+        (SELECT balance FROM balance_history WHERE date < :day ORDER BY date DESC LIMIT 1), 0
+    ))
+""")
+
+# Keeps the history in sync with the full rebuild, which only has rows for
+# days that still have transactions
+DELETE_EMPTY_BALANCE_DAY = text("""
+    DELETE FROM balance_history
+    WHERE date = :day AND NOT EXISTS (SELECT 1 FROM transactions WHERE date = :day)
+""")
+
+
+# Monthly rollup of the balance history between two dates (whole months),
+# with the balance of the last day of each month as its closing balance
+REFRESH_BALANCE_MONTHLY = text("""
+    INSERT INTO balance_monthly (month, income, expense, balance)
+    SELECT month, income, expense, balance
+    FROM (
+        SELECT date(date, 'start of month') AS month,
+               SUM(income) OVER months AS income,
+               SUM(expense) OVER months AS expense,
+               balance,
+               ROW_NUMBER() OVER (PARTITION BY date(date, 'start of month') ORDER BY date DESC) AS position
+        FROM balance_history
+        WHERE date >= :start AND date <= :end
+        WINDOW months AS (PARTITION BY date(date, 'start of month'))
+    )
+    WHERE position = 1
+""")
+
+# Weekly buckets (starting on monday) of the balance history between two dates
+BALANCE_WEEKLY = text("""
+    SELECT week, income, expense, balance
+    FROM (
+        SELECT date(date, 'weekday 0', '-6 days') AS week,
+               SUM(income) OVER weeks AS income,
+               SUM(expense) OVER weeks AS expense,
+               balance,
+               ROW_NUMBER() OVER (PARTITION BY date(date, 'weekday 0', '-6 days') ORDER BY date DESC) AS position
+        FROM balance_history
+        WHERE date >= :start AND date <= :end
+        WINDOW weeks AS (PARTITION BY date(date, 'weekday 0', '-6 days'))
+    )
+    WHERE position = 1
+    ORDER BY week
+""")
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def month_end(day):
+    if day.month == 12:
+        return day.replace(day=31)
+    return day.replace(month=day.month + 1, day=1) - timedelta(days=1)
+
+
+def refresh_monthly(session, start=date.min, end=date.max):
+    """Recomputes the monthly rollup of the whole months between start and end."""
+    start, end = month_start(start), month_end(end)
+    session.flush()
+    session.query(BalanceMonthly)\
+        .filter(BalanceMonthly.month >= start, BalanceMonthly.month <= end)\
+        .delete(synchronize_session=False)
+    session.execute(REFRESH_BALANCE_MONTHLY, {"start": start.isoformat(), "end": end.isoformat()})
+
+
+def weekly_balance(session, start, end):
+    """Returns the weekly buckets of the balance history between start and end."""
+    return session.execute(
+        BALANCE_WEEKLY, {"start": start.isoformat(), "end": end.isoformat()}
+    ).fetchall()
+
+
+def balance_at(session, day):
+    """Returns (date, balance) of the latest history row on or before day, or None.
+
+    A single seek on the date index, whatever the length of the history.
+    """
+    return session.query(BalanceHistory.date, BalanceHistory.balance)\
+        .filter(BalanceHistory.date <= day)\
+        .order_by(BalanceHistory.date.desc())\
+        .first()
+
+
+def balance_index(session):
+    """Returns the dates and balances of the whole history, in date order, for balances_at."""
+    rows = session.query(BalanceHistory.date, BalanceHistory.balance).order_by(BalanceHistory.date).all()
+    return [row.date for row in rows], [row.balance for row in rows]
+
+
+def balances_at(index, days):
+    """Like balance_at for each day, by bisection over a balance_index."""
+    dates, balances = index
+    result = []
+    for day in days:
+        position = bisect_right(dates, day) - 1
+        result.append((dates[position], balances[position]) if position >= 0 else None)
+    return result
+
 
 def calculate_balance(session):
-    # Get all transactions ordered by date
-    transactions = session.query(Transaction).order_by(Transaction.date).all()
-    
-    running_balance = Decimal('0')
-    balance_records = {}
-    
-    # First, clear existing balance history
-    session.query(BalanceHistory).delete()
-    
-    for transaction in transactions:
-        amount = Decimal(str(transaction.amount))
-        date_key = transaction.date
-        
-        if date_key not in balance_records:
-            balance_records[date_key] = {
-                'date': date_key,
-                'income': Decimal('0'),
-                'expense': Decimal('0'),
-                'balance': Decimal('0')
-            }
-            
-        if transaction.type == TransactionType.INCOME:
-            running_balance += amount
-            balance_records[date_key]['income'] += amount
-        else:
-            running_balance -= amount
-            balance_records[date_key]['expense'] += amount
-            
-        balance_records[date_key]['balance'] = running_balance
-    
+    """Rebuilds the whole balance history, and the category summary, from the transactions.
+
+    The history is replaced with a single INSERT ... SELECT, so no ORM object
+    is loaded and memory stays flat regardless of the ledger size.
+    """
+    try:
+        with timed(balance_rebuild_duration, "full"):
+            _rebuild_history_from(session, date.min)
+            rebuild_category_summary(session)
+            consistency.mark_consistent(session)
+            session.commit()
+    except Exception as e:
+        session.rollback()
+        raise e
+
+
+def rebuild_balance_from(session, start):
+    """Rebuilds the balance history from a date on, keeping the earlier days.
+
+    Used to catch up with many writes at once, starting from the earliest
+    date they touched, or earlier if writes of other processes are still
+    pending a recalculation.
+    """
     try:
-        # Update balance history
-        for date, record in balance_records.items():
-            balance_history = BalanceHistory(
-                date=date,
-                income=str(record['income']),
-                expense=str(record['expense']),
-                balance=str(record['balance'])
-            )
-            session.add(balance_history)
-            
-        session.commit()
+        pending = consistency.dirty_from(session)
+        if pending is not None and pending < start:
+            start = pending
+        with timed(balance_rebuild_duration, "partial"):
+            _rebuild_history_from(session, start)
+            consistency.mark_consistent(session)
+            session.commit()
     except Exception as e:
         session.rollback()
         raise e
+
+
+def _rebuild_history_from(session, start):
+    previous = session.query(BalanceHistory.balance)\
+        .filter(BalanceHistory.date < start)\
+        .order_by(BalanceHistory.date.desc())\
+        .first()
+
+    session.query(BalanceHistory)\
+        .filter(BalanceHistory.date >= start)\
+        .delete(synchronize_session=False)
+    session.execute(REBUILD_BALANCE_HISTORY, {
+        "income": TransactionType.INCOME,
+        "start": start.isoformat(),
+        "opening": previous.balance if previous else 0
+    })
+    refresh_monthly(session, start)
+    invalidate_on_commit(session, BALANCE)
+
+
+def apply_entry(session, entry, sign=1):
+    """Applies (sign=1) or reverts (sign=-1) a ledger entry on the balance history.
+
+    Only the row of the entry date and the running balance of the later rows
+    are touched. The caller is responsible for flushing the transaction
+    change beforehand and for committing the session afterwards.
+
+    In the background mode the history is not touched here: once the session
+    commits, the recalculation worker is asked to rebuild it from the entry date.
+    """
+    apply_entries(session, [(entry, sign)])
+
+
+def apply_entries(session, entries):
+    """Applies many (entry, sign) pairs like apply_entry, with one update per day.
+
+    The entries are summed by date first, so a batch touching the same day
+    many times shifts the later rows only once.
+    """
+    if not entries:
+        return
+
+    if recalculation.background_mode:
+        start = min(entry.date for entry, sign in entries)
+        recalculation.recalculate_on_commit(session, start)
+        consistency.mark_dirty(session, start)
+        return
+
+    consistency.keep_consistent(session)
+
+    totals = {}
+    for entry, sign in entries:
+        income, expense = totals.get(entry.date, (0, 0))
+        if entry.type == TransactionType.INCOME:
+            income += entry.amount * sign
+        else:
+            expense += entry.amount * sign
+        totals[entry.date] = (income, expense)
+
+    for day in sorted(totals):
+        income, expense = totals[day]
+        apply_balance_delta(session, day, income=income, expense=expense)
+
+
+def apply_balance_delta(session, day, income=0, expense=0):
+    net = income - expense
+    invalidate_on_commit(session, BALANCE)
+
+    parameters = {"day": day.isoformat(), "income": income, "expense": expense, "net": net}
+    if session.execute(ADD_TO_BALANCE_DAY, parameters).rowcount == 0:
+        session.execute(INSERT_BALANCE_DAY, parameters)
+
+    if net != 0:
+        session.query(BalanceHistory)\
+            .filter(BalanceHistory.date > day)\
+            .update({BalanceHistory.balance: BalanceHistory.balance + net}, synchronize_session='evaluate')
+
+    session.execute(DELETE_EMPTY_BALANCE_DAY, parameters)
+
+    # The month of the day is recomputed from its days, and the closing
+    # balance of the later months shifts like the later days
+    refresh_monthly(session, day, day)
+    if net != 0:
+        session.query(BalanceMonthly)\
+            .filter(BalanceMonthly.month > month_start(day))\
+            .update({BalanceMonthly.balance: BalanceMonthly.balance + net}, synchronize_session='evaluate')
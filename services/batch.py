@@ -0,0 +1,122 @@
+from datetime import datetime
+
+from models.transaction import Transaction
+from models.category import Category
+from models.money import to_cents
+from services.balance import LedgerEntry, apply_entries
+from services.category_summary import apply_summary
+
+CREATE = "create"
+UPDATE = "update"
+DELETE = "delete"
+
+
+class BatchOperationError(ValueError):
+    """An operation of a batch that cannot be applied; the whole batch is rejected."""
+
+    def __init__(self, index, message, status=400):
+        super().__init__(f"Operação {index}: {message}")
+        self.status = status
+
+
+def _check_operation(index, operation):
+    if operation.op == CREATE:
+        if operation.transaction is None:
+            raise BatchOperationError(index, "a criação precisa da transação")
+    elif operation.id is None:
+        raise BatchOperationError(index, "o id da transação é obrigatório")
+    elif operation.op == UPDATE and operation.transaction is None:
+        raise BatchOperationError(index, "a atualização precisa da transação")
+
+
+def apply_batch(session, operations):
+    """Applies create, update and delete operations in order, in the session transaction.
+
+    Categories and existing transactions are loaded with one query each, the
+    changes are flushed together and the balance history is updated once for
+    all of them. Nothing is committed: the caller commits the whole batch, or
+    rolls it back when a BatchOperationError is raised.
+
+    Returns the result of each operation, in order.
+    """
+    for index, operation in enumerate(operations):
+        _check_operation(index, operation)
+
+    category_ids = {operation.transaction.category_id for operation in operations
+                    if operation.transaction is not None and operation.transaction.category_id}
+    categories = {}
+    if category_ids:
+        categories = {category.id: category for category in
+                      session.query(Category).filter(Category.id.in_(category_ids))}
+
+    transaction_ids = {operation.id for operation in operations if operation.op != CREATE}
+    transactions = {}
+    if transaction_ids:
+        transactions = {transaction.id: transaction for transaction in
+                        session.query(Transaction).filter(Transaction.id.in_(transaction_ids))}
+
+    # (entry, sign) pairs of the previous and new state of every change
+    entries = []
+    # (operation, transaction) of every operation, to build the results once
+    # the created transactions have an id
+    applied = []
+
+    for index, operation in enumerate(operations):
+        body = operation.transaction
+        if body is not None and body.category_id and body.category_id not in categories:
+            raise BatchOperationError(index, f"Categoria com id {body.category_id} não encontrada", 404)
+
+        if operation.op == CREATE:
+            try:
+                transaction = Transaction(
+                    description=body.description,
+                    amount=body.amount,
+                    date=body.date,
+                    type=body.type,
+                    category=categories.get(body.category_id)
+                )
+            except ValueError as e:
+                raise BatchOperationError(index, f"Entrada inválida: {e}")
+            session.add(transaction)
+            entries.append((LedgerEntry.of(transaction), 1))
+            applied.append((operation, transaction))
+            continue
+
+        transaction = transactions.get(operation.id)
+        if transaction is None:
+            raise BatchOperationError(index, f"Transação com id {operation.id} não encontrada", 404)
+        entries.append((LedgerEntry.of(transaction), -1))
+
+        if operation.op == DELETE:
+            session.delete(transaction)
+            # A later operation on the same id finds it deleted
+            del transactions[operation.id]
+        else:
+            try:
+                date = datetime.strptime(body.date, '%Y-%m-%d').date()
+            except ValueError as e:
+                raise BatchOperationError(index, f"Entrada inválida: {e}")
+            # Like update_transaction, the category is kept when not given
+            if body.category_id:
+                transaction.category = categories[body.category_id]
+                transaction.category_id = body.category_id
+            transaction.description = body.description
+            transaction.amount = to_cents(body.amount)
+            transaction.date = date
+            transaction.type = body.type
+            entries.append((LedgerEntry.of(transaction), 1))
+        applied.append((operation, transaction))
+
+    session.flush()
+    apply_entries(session, entries)
+    for entry, sign in entries:
+        apply_summary(session, entry, sign)
+
+    return [
+        {
+            "op": operation.op,
+            "id": transaction.id,
+            "transaction": transaction.to_dict() if operation.op != DELETE else None
+        }
+        for operation, transaction in applied
+    ]
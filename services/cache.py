@@ -0,0 +1,115 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+
+from models import Session
+from models.accounts import current_account
+from services.sync import current_data_version
+
+# Namespaces of cached data, invalidated by the writes that change them
+BALANCE = "balance"
+CATEGORY = "category"
+
+
+class ReadCache:
+    """
+    Thread safe in-process cache of read endpoint payloads, bounded by a
+    time to live and by a maximum number of entries (least recently used
+    entries are evicted first).
+
+    Each entry keeps the data version read before it was computed, and is
+    only served while the database is still at that version, so a write made
+    by another process (e.g. another gunicorn worker) or outside the
+    application is never hidden by the cache. Checking costs one read of the
+    data version. Invalidating a namespace drops its entries right away.
+    Namespaces are kept per account, so the accounts never see nor
+    invalidate each other's data.
+    """
+
+    def __init__(self, version, max_entries=256, ttl=30):
+        self.version = version  # returns the current data version
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_set(self, namespace, key, compute):
+        """Returns the cached value of (namespace, key), or computes and stores it."""
+        if self.ttl <= 0:
+            return compute()
+
+        cache_key = ((current_account.get(), namespace), key)
+        # Read before computing: a value stored with it may be newer than
+        # the version, never older
+        version = self.version()
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and entry[0] > time.monotonic() and entry[1] == version:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+
+        value = compute()
+
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            # A slower request computing an older version does not replace a newer entry
+            if entry is None or entry[1] <= version:
+                self._entries[cache_key] = (time.monotonic() + self.ttl, version, value)
+                self._entries.move_to_end(cache_key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, *namespaces, account=None):
+        """Drops the entries of namespaces of account, by default the current one."""
+        account = account or current_account.get()
+        namespaces = [(account, namespace) for namespace in namespaces]
+        with self._lock:
+            for cache_key in [key for key in self._entries if key[0] in namespaces]:
+                del self._entries[cache_key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl
+            }
+
+
+read_cache = ReadCache(
+    current_data_version,
+    max_entries=int(os.environ.get("MYBALANCE_CACHE_MAX_ENTRIES", 256)),
+    ttl=float(os.environ.get("MYBALANCE_CACHE_TTL", 30))
+)
+
+
+def invalidate_on_commit(session, *namespaces):
+    """
+    Marks namespaces to be invalidated when the session commits, freeing
+    entries the new data version makes stale anyway. Until then other
+    requests still read the previous committed state, which is what the
+    cache holds; on rollback nothing is invalidated.
+    """
+    session.info.setdefault("invalidate", set()).update(namespaces)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    namespaces = session.info.pop("invalidate", None)
+    if namespaces:
+        read_cache.invalidate(*namespaces, account=session.account)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session):
+    session.info.pop("invalidate", None)
@@ -0,0 +1,58 @@
+from sqlalchemy.sql import func, text
+
+from models.category_summary import CategorySummary
+from schemas.transaction import TransactionType
+
+REBUILD_CATEGORY_SUMMARY = text("""
+    INSERT INTO category_summary (category_id, month, income, expense, count)
+    SELECT category_id,
+           date(date, 'start of month'),
+           SUM(CASE WHEN type = :income THEN amount ELSE 0 END),
+           SUM(CASE WHEN type = :income THEN 0 ELSE amount END),
+           COUNT(*)
+    FROM transactions
+    GROUP BY category_id, date(date, 'start of month')
+""")
+
+
+def rebuild_category_summary(session):
+    """Recomputes the whole category summary from the transactions. Does not commit."""
+    session.query(CategorySummary).delete()
+    session.execute(REBUILD_CATEGORY_SUMMARY, {"income": TransactionType.INCOME})
+
+
+def apply_summary(session, entry, sign=1):
+    """Applies (sign=1) or reverts (sign=-1) a ledger entry on the category summary.
+
+    Like apply_entry, it runs in the transaction of the write and leaves the
+    commit to the caller.
+    """
+    month = entry.date.replace(day=1)
+    category_filter = CategorySummary.category_id.is_(None) if entry.category_id is None \
+        else CategorySummary.category_id == entry.category_id
+
+    summary = session.query(CategorySummary)\
+        .filter(category_filter, CategorySummary.month == month)\
+        .first()
+    if summary is None:
+        summary = CategorySummary(category_id=entry.category_id, month=month)
+        session.add(summary)
+
+    if entry.type == TransactionType.INCOME:
+        summary.income += entry.amount * sign
+    else:
+        summary.expense += entry.amount * sign
+    summary.count += sign
+
+    if summary.count == 0:
+        if summary in session.new:
+            session.expunge(summary)
+        else:
+            session.delete(summary)
+
+
+def category_transaction_count(session, category_id):
+    """Returns how many transactions use the category, from the summary."""
+    return session.query(func.coalesce(func.sum(CategorySummary.count), 0))\
+        .filter(CategorySummary.category_id == category_id)\
+        .scalar()
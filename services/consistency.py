@@ -0,0 +1,110 @@
+from sqlalchemy import event
+from sqlalchemy.sql import text
+
+from models import Session
+from models.ledger_state import LedgerState
+from services import balance
+from services.sync import data_version
+
+# The ledger state row is only updated by commits that leave the balances
+# consistent with the transactions: rebuilds always, incremental writes
+# only if the balances were consistent when they started. Any other write,
+# including one made outside the application, bumps the data version past
+# the watermark.
+UPDATE_WATERMARK = text("""
+    UPDATE ledger_state
+    SET version = (SELECT COALESCE(MAX(version), 0) FROM change_log), dirty_from = NULL
+    WHERE id = 1
+""")
+
+KEEP_WATERMARK = text("""
+    UPDATE ledger_state
+    SET version = (SELECT COALESCE(MAX(version), 0) FROM change_log)
+    WHERE id = 1 AND version = :before
+""")
+
+MARK_DIRTY = text("""
+    UPDATE ledger_state SET dirty_from = :day
+    WHERE id = 1 AND (dirty_from IS NULL OR dirty_from > :day)
+""")
+
+
+def mark_consistent(session):
+    """Moves the watermark to the data version of the session once it commits.
+
+    Used by rebuilds, which leave the balances consistent whatever their
+    previous state was (a partial rebuild trusts the days before its start).
+    """
+    session.info["watermark"] = "update"
+
+
+def keep_consistent(session):
+    """Moves the watermark along with an incremental write, or a write that does
+    not touch the balances (e.g. of a category), once the session commits.
+
+    The watermark only moves if it was current before the write, so a write
+    on top of inconsistent balances does not hide their inconsistency.
+    """
+    session.info.setdefault("watermark", "keep")
+
+
+def mark_dirty(session, day):
+    """Persists, with the write, that the balances must be recalculated from day on."""
+    dirty_from = session.info.get("dirty_from")
+    if dirty_from is None or day < dirty_from:
+        session.info["dirty_from"] = day
+
+
+def dirty_from(session):
+    """Returns the earliest date whose recalculation is pending, in any process."""
+    return session.query(LedgerState.dirty_from).filter(LedgerState.id == 1).scalar()
+
+
+def ensure_consistent(session):
+    """
+    Makes sure the balances match the transactions. The check is a single
+    read of the watermark and of the data version; the balances are only
+    rebuilt if something was written since they were last consistent
+    without keeping them so (e.g. a pending background recalculation, or a
+    write made outside the application).
+
+    Returns "clean" or "rebuilt".
+    """
+    state = session.query(LedgerState).filter(LedgerState.id == 1).one()
+    if state.dirty_from is None and state.version == data_version(session):
+        return "clean"
+
+    balance.calculate_balance(session)
+    return "rebuilt"
+
+
+@event.listens_for(Session, "before_flush")
+def _remember_version(session, flush_context, instances):
+    # The data version before the first write of the transaction, for
+    # keep_consistent. Flushes only happen when there are changes
+    if "version_before" not in session.info:
+        session.info["version_before"] = data_version(session)
+
+
+@event.listens_for(Session, "before_commit")
+def _save_watermark(session):
+    watermark = session.info.pop("watermark", None)
+    day = session.info.pop("dirty_from", None)
+    if watermark is None and day is None:
+        return
+
+    session.flush()
+    if day is not None:
+        session.execute(MARK_DIRTY, {"day": day.isoformat()})
+    elif watermark == "update":
+        session.execute(UPDATE_WATERMARK)
+    elif "version_before" in session.info:
+        session.execute(KEEP_WATERMARK, {"before": session.info["version_before"]})
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _forget_version(session):
+    session.info.pop("version_before", None)
+    session.info.pop("watermark", None)
+    session.info.pop("dirty_from", None)
@@ -0,0 +1,158 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
+
+from models.transaction import Transaction
+from models.category import Category
+from models.money import to_cents
+from schemas.transaction import TransactionSchema
+from services.balance import calculate_balance
+
+# Rows validated and inserted per chunk; each chunk is committed on its own
+BATCH_SIZE = 1000
+# Only the first errors are reported in detail, the rest are just counted
+MAX_REPORTED_ERRORS = 100
+
+CSV = "csv"
+NDJSON = "ndjson"
+
+FORMATS_BY_MIMETYPE = {
+    "text/csv": CSV,
+    "application/csv": CSV,
+    "application/x-ndjson": NDJSON,
+    "application/ndjson": NDJSON,
+    "application/jsonl": NDJSON,
+}
+
+
+def read_csv(stream):
+    """Yields (row number, raw row) for every line of a CSV stream with a header."""
+    reader = csv.DictReader(stream)
+    for number, row in enumerate(reader, start=1):
+        # Empty cells mean the optional field was not given
+        yield number, {key: value for key, value in row.items() if value not in ("", None)}
+
+
+def read_ndjson(stream):
+    """Yields (row number, raw line) for every non-empty line of a NDJSON stream."""
+    for number, line in enumerate(stream, start=1):
+        if line.strip():
+            yield number, line
+
+
+def _parse_row(raw, category_ids):
+    """Validates a raw row and returns the values to be inserted in transactions."""
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except ValueError as e:
+            raise ValueError(f"JSON inválido: {e}")
+
+    body = TransactionSchema.parse_obj(raw)
+
+    if body.category_id is not None and body.category_id not in category_ids:
+        raise ValueError(f"Categoria com id {body.category_id} não encontrada")
+
+    return {
+        "description": body.description,
+        "amount": to_cents(body.amount),
+        "category_id": body.category_id,
+        "date": datetime.strptime(body.date, '%Y-%m-%d').date(),
+        "type": body.type,
+    }
+
+
+def _error_message(e):
+    if isinstance(e, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(loc) for loc in error['loc'])}: {error['msg']}" for error in e.errors()
+        )
+    return str(e)
+
+
+def _constraint_message(e):
+    # The database error carries the SQL and its parameters, so only the
+    # violated constraint is told to the client
+    error = str(e.orig)
+    if "UNIQUE" in error:
+        return "Já existe uma transação com esta descrição e categoria"
+    if "NOT NULL" in error and "category_id" in error:
+        return "category_id: a categoria é obrigatória"
+    return "A transação viola uma restrição do banco de dados"
+
+
+def import_transactions(session, stream, format, batch_size=BATCH_SIZE):
+    """Imports the transactions of a CSV or NDJSON text stream.
+
+    Rows are parsed one at a time, validated and inserted in chunks with a
+    single executemany INSERT each. Invalid rows are skipped and reported;
+    a chunk rejected by a database constraint is inserted again row by row,
+    so only the offending rows are left out.
+    The balance history is rebuilt once, after the last chunk.
+    """
+    rows = read_csv(stream) if format == CSV else read_ndjson(stream)
+    category_ids = {id for (id,) in session.query(Category.id)}
+    # Ends the read, so a write session only holds the write lock while
+    # inserting a chunk, not while the next rows are received
+    session.commit()
+    insert = Transaction.__table__.insert()
+
+    result = {"received": 0, "inserted": 0, "failed": 0, "errors": []}
+    # (row number, values) of the rows waiting to be inserted
+    batch = []
+
+    def report(number, message):
+        result["failed"] += 1
+        if len(result["errors"]) < MAX_REPORTED_ERRORS:
+            result["errors"].append({"row": number, "message": message})
+
+    def flush_batch():
+        if not batch:
+            return
+        try:
+            with session.begin_nested():
+                session.execute(insert, [values for _, values in batch])
+            inserted = len(batch)
+        except IntegrityError:
+            inserted = 0
+            for number, values in batch:
+                try:
+                    with session.begin_nested():
+                        session.execute(insert, values)
+                    inserted += 1
+                except IntegrityError as e:
+                    report(number, _constraint_message(e))
+        session.commit()
+        result["inserted"] += inserted
+        batch.clear()
+
+    try:
+        for number, raw in rows:
+            result["received"] += 1
+            try:
+                batch.append((number, _parse_row(raw, category_ids)))
+            except (ValidationError, ValueError, TypeError) as e:
+                report(number, _error_message(e))
+
+            if len(batch) >= batch_size:
+                flush_batch()
+
+        flush_batch()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        # Chunks already committed must be reflected on the balance history
+        if result["inserted"]:
+            calculate_balance(session)
+
+    return result
+
+
+def text_stream(binary_stream):
+    """Wraps a binary stream (e.g. the request body) to be read as UTF-8 text."""
+    return io.TextIOWrapper(binary_stream, encoding="utf-8-sig", newline="")
@@ -0,0 +1,90 @@
+import os
+import re
+
+from flask.json.provider import DefaultJSONProvider
+
+# orjson is optional: without it the standard library encoder is used
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ORJSON = "orjson"
+STDLIB = "stdlib"
+
+# Encoder of the responses: orjson when installed, unless set to stdlib
+json_backend = os.environ.get("MYBALANCE_JSON_BACKEND", ORJSON)
+orjson_enabled = orjson is not None and json_backend == ORJSON
+
+COMPACT = (",", ":")
+
+# Characters that json.dumps escapes with ensure_ascii and orjson writes as is
+NON_ASCII = re.compile("[\x7f-\U0010ffff]")
+# Floats that json.dumps writes in exponent notation are written by orjson
+# without the sign (1e16) or in full (0.00001). Matches inside strings only
+# make the payload be encoded by json.dumps
+EXPONENT = re.compile(rb"e[-0-9]")
+SMALL_FLOAT = b"0.0000"
+
+
+def _escape(match):
+    code = ord(match.group())
+    if code < 0x10000:
+        return "\\u%04x" % code
+    # Surrogate pair, like json.dumps
+    code -= 0x10000
+    return "\\u%04x\\u%04x" % (0xd800 | (code >> 10), 0xdc00 | (code & 0x3ff))
+
+
+def ascii_json(data):
+    """Escapes the non-ASCII characters of JSON encoded by orjson like json.dumps."""
+    # Without escaped backslashes in data, every \x and \U in the output of
+    # backslashreplace escapes a character, and \xNN only differs from the
+    # JSON escape by its prefix
+    if b"\\\\" not in data:
+        text = data.decode().encode("ascii", "backslashreplace")
+        if b"\\U" not in text:
+            return text.replace(b"\\x", b"\\u00").replace(b"\x7f", b"\\u007f").decode()
+    return NON_ASCII.sub(_escape, data.decode())
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider encoding the compact responses with orjson, with the
+    exact output of the default provider: sorted keys, non-ASCII characters
+    escaped, dates as HTTP dates and Decimal as strings (through default).
+
+    Payloads orjson cannot encode the same way (integers beyond 64 bits,
+    non-string keys, exponent floats, ...) and the indented debug output
+    use the default provider. NaN and infinities, which are not valid JSON,
+    are written as null.
+    """
+
+    options = 0
+    if orjson is not None:
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+    def dumps(self, obj, **kwargs):
+        if not self._fast(kwargs):
+            return super().dumps(obj, **kwargs)
+
+        options = self.options | orjson.OPT_SORT_KEYS if self.sort_keys else self.options
+        try:
+            data = orjson.dumps(obj, default=self.default, option=options)
+        except TypeError:  # orjson.JSONEncodeError included
+            return super().dumps(obj, **kwargs)
+        if SMALL_FLOAT in data or EXPONENT.search(data):
+            return super().dumps(obj, **kwargs)
+
+        if not self.ensure_ascii or (data.isascii() and b"\x7f" not in data):
+            return data.decode()
+        return ascii_json(data)
+
+    def _fast(self, kwargs):
+        """Whether dumps can use orjson for these arguments and settings."""
+        if not orjson_enabled or kwargs.keys() - {"separators"} or kwargs.get("separators") != COMPACT:
+            return False
+        # The deprecated Flask 2.2 settings are left to the default provider
+        config = self._app.config
+        return self._app._json_encoder is None and config["JSON_AS_ASCII"] is None \
+            and config["JSON_SORT_KEYS"] is None
@@ -0,0 +1,212 @@
+import threading
+import time
+from bisect import bisect_left
+
+from flask import g, has_app_context, request
+from sqlalchemy import event
+
+# Bucket upper bounds (le) of the histograms
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=""):
+    labels = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        labels.append(extra)
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+def _format_number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """
+    Base of the metrics kept in memory and exposed in the Prometheus text
+    format. Values are kept by label values, in the order of label_names.
+    """
+    type = None
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.extend(self._render_value(labels, value))
+        return lines
+
+    def _render_value(self, labels, value):
+        return [f"{self.name}{_format_labels(self.label_names, labels)} {_format_number(value)}"]
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount=1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def inc(self, amount=1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, amount=1, *labels):
+        self.inc(-amount, *labels)
+
+
+class Histogram(Metric):
+    """Counts observations in cumulative buckets, with their sum and count."""
+    type = "histogram"
+
+    def __init__(self, name, documentation, label_names=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # one count per bucket plus +Inf, then the sum
+                state = self._values[labels] = [0] * (len(self.buckets) + 1) + [0]
+            state[bisect_left(self.buckets, value)] += 1
+            state[-1] += value
+
+    def _render_value(self, labels, state):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), state):
+            cumulative += count
+            le = 'le="%s"' % _format_number(float(bound))
+            lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {_format_number(state[-1])}")
+        lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+registry = []
+
+requests_total = Counter(
+    "mybalance_http_requests_total", "Requisições atendidas, por rota e status.",
+    ("method", "route", "status")
+)
+request_duration = Histogram(
+    "mybalance_http_request_duration_seconds", "Duração das requisições, por rota.",
+    ("method", "route")
+)
+requests_in_flight = Gauge("mybalance_http_requests_in_flight", "Requisições em andamento.")
+request_sql_statements = Histogram(
+    "mybalance_http_request_sql_statements", "Comandos SQL executados por requisição, por rota.",
+    ("method", "route"), buckets=STATEMENT_BUCKETS
+)
+request_sql_duration = Histogram(
+    "mybalance_http_request_sql_seconds", "Tempo em SQL por requisição, por rota.",
+    ("method", "route")
+)
+sql_statements_total = Counter("mybalance_sql_statements_total", "Comandos SQL executados.")
+sql_duration_total = Counter("mybalance_sql_seconds_total", "Tempo total em SQL.")
+balance_rebuild_duration = Histogram(
+    "mybalance_balance_rebuild_seconds", "Duração das reconstruções do histórico de saldo.",
+    ("scope",)
+)
+
+
+def render():
+    """Returns every metric in the Prometheus text format."""
+    lines = []
+    for metric in registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def _route():
+    # The rule template keeps the label set small (e.g. /transaction/<int:id>)
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+
+def _before_request():
+    requests_in_flight.inc()
+    g.metrics = {"start": time.perf_counter(), "statements": 0, "sql_seconds": 0.0, "recorded": False}
+
+
+def _record(status):
+    state = g.metrics
+    state["recorded"] = True
+    route = _route()
+    requests_total.inc(1, request.method, route, str(status))
+    request_duration.observe(time.perf_counter() - state["start"], request.method, route)
+    request_sql_statements.observe(state["statements"], request.method, route)
+    request_sql_duration.observe(state["sql_seconds"], request.method, route)
+
+
+def _after_request(response):
+    if "metrics" in g:
+        _record(response.status_code)
+    return response
+
+
+def _teardown_request(exception):
+    if "metrics" in g:
+        if not g.metrics["recorded"]:
+            _record(500)
+        requests_in_flight.dec()
+
+
+def init_app(app):
+    """
+    Instruments the requests of app. Streamed responses are measured up to
+    the start of the stream.
+    """
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+
+
+def instrument_engine(engine):
+    """Counts the statements run by engine and their time, also per request."""
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_statement(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _end_statement(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["metrics_start"].pop()
+        sql_statements_total.inc()
+        sql_duration_total.inc(elapsed)
+        if has_app_context() and "metrics" in g:
+            g.metrics["statements"] += 1
+            g.metrics["sql_seconds"] += elapsed
+
+
+class timed:
+    """Context manager observing the time of its block on a histogram."""
+
+    def __init__(self, histogram, *labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
@@ -0,0 +1,18 @@
+import base64
+from datetime import datetime
+
+
+def encode_cursor(date, id):
+    """Encodes the keyset (date, id) of the last row of a page as an opaque cursor."""
+    raw = f"{date.strftime('%Y-%m-%d')}:{id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Decodes a cursor created by encode_cursor. Raises ValueError if it is invalid."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        date, id = raw.split(":")
+        return datetime.strptime(date, '%Y-%m-%d').date(), int(id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Cursor inválido: {cursor}") from e
@@ -0,0 +1,225 @@
+import logging
+import os
+import threading
+import time
+from datetime import date
+
+from sqlalchemy import event
+
+from models import Session
+from models.accounts import current_account
+from services import balance, consistency
+
+INCREMENTAL = "incremental"
+BACKGROUND = "background"
+
+# In the background mode transaction writes do not update the balance
+# history themselves; a worker thread per account rebuilds it after them
+balance_mode = os.environ.get("MYBALANCE_BALANCE_MODE", INCREMENTAL)
+background_mode = balance_mode == BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+
+class RecalculationWorker:
+    """
+    Rebuilds the balance history in a background thread after writes.
+
+    Requests arriving while the worker waits are coalesced: it waits until
+    no request came for `debounce` seconds (or `max_delay` seconds passed
+    since the first one) and runs a single rebuild starting from the earliest
+    date requested. A request from date.min rebuilds the whole history and
+    the category summary, like calculate_balance.
+
+    A failed rebuild is retried from the same date, after `retry_delay`
+    seconds doubling with each consecutive failure up to `max_retry_delay`,
+    so a persistent error (e.g. a locked database) is not retried in a loop.
+
+    After `idle_timeout` seconds without requests the thread ends and the
+    worker is dropped, so accounts that are no longer written do not keep
+    one; the next request of the account starts a new worker.
+    """
+
+    def __init__(self, account, debounce=0.5, max_delay=5.0, retry_delay=1.0, max_retry_delay=60.0,
+                 idle_timeout=60.0):
+        self.account = account
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.idle_timeout = idle_timeout
+        self.failures = 0
+        self._condition = threading.Condition()
+        self._thread = None
+        self._dirty_from = None
+        self.requested_version = 0
+        self.applied_version = 0
+        self.last_error = None
+
+    def request(self, day):
+        with self._condition:
+            if self._dirty_from is None or day < self._dirty_from:
+                self._dirty_from = day
+            self.requested_version += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"balance-recalculation-{self.account}",
+                                                daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+    def _next_run(self):
+        """Waits for requests to settle and returns (start date, version) to be rebuilt,
+        or None if no request came for idle_timeout seconds."""
+        with self._condition:
+            idle_until = time.monotonic() + self.idle_timeout
+            while self._dirty_from is None:
+                remaining = idle_until - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._condition.wait(timeout=remaining)
+
+            first_request = time.monotonic()
+            while True:
+                seen = self.requested_version
+                remaining = self.max_delay - (time.monotonic() - first_request)
+                self._condition.wait(timeout=max(0, min(self.debounce, remaining)))
+                if self.requested_version == seen or remaining <= 0:
+                    break
+
+            start, self._dirty_from = self._dirty_from, None
+            return start, self.requested_version
+
+    def _run(self):
+        while True:
+            run = self._next_run()
+            if run is None:
+                if self._release():
+                    return
+                continue
+
+            start, version = run
+            try:
+                self._rebuild(start)
+            except Exception as e:
+                logger.exception("Falha ao recalcular o saldo da conta %s", self.account)
+                self._retry_later(start, e)
+            else:
+                with self._condition:
+                    self.applied_version = version
+                    self.last_error = None
+                    self.failures = 0
+                    self._condition.notify_all()
+
+    def _release(self):
+        """Drops the idle worker; returns False if a request arrived meanwhile."""
+        # Same lock order as request_recalculation, which registers the
+        # worker and requests the rebuild as one step
+        with _workers_lock, self._condition:
+            if self._dirty_from is not None:
+                return False
+            self._thread = None
+            if _workers.get(self.account) is self:
+                del _workers[self.account]
+            return True
+
+    def _rebuild(self, start):
+        session = Session(account=self.account, write=True)
+        try:
+            if start == date.min:
+                balance.calculate_balance(session)
+            else:
+                balance.rebuild_balance_from(session, start)
+        finally:
+            session.close()
+
+    def _retry_later(self, start, error):
+        """Keeps start to be rebuilt again and waits the backoff delay of the failures so far."""
+        with self._condition:
+            self.last_error = str(error)
+            self.failures += 1
+            if self._dirty_from is None or start < self._dirty_from:
+                self._dirty_from = start
+
+            # The exponent is capped, so a long outage never overflows the float
+            delay = min(self.retry_delay * 2 ** min(self.failures - 1, 32), self.max_retry_delay)
+            retry_at = time.monotonic() + delay
+            # Requests arriving meanwhile only move _dirty_from, for the retry
+            while time.monotonic() < retry_at:
+                self._condition.wait(timeout=retry_at - time.monotonic())
+
+    def status(self):
+        with self._condition:
+            return {
+                "mode": balance_mode,
+                "current": self.applied_version >= self.requested_version,
+                "requested_version": self.requested_version,
+                "applied_version": self.applied_version,
+                "dirty_from": self._dirty_from.isoformat() if self._dirty_from else None,
+                "last_error": self.last_error
+            }
+
+
+debounce = float(os.environ.get("MYBALANCE_RECALCULATION_DEBOUNCE", 0.5))
+max_delay = float(os.environ.get("MYBALANCE_RECALCULATION_MAX_DELAY", 5.0))
+retry_delay = float(os.environ.get("MYBALANCE_RECALCULATION_RETRY_DELAY", 1.0))
+max_retry_delay = float(os.environ.get("MYBALANCE_RECALCULATION_MAX_RETRY_DELAY", 60.0))
+idle_timeout = float(os.environ.get("MYBALANCE_RECALCULATION_IDLE_TIMEOUT", 60.0))
+
+# Each account has its own database, so their rebuilds run side by side;
+# only the accounts written recently have a worker
+_workers = {}
+_workers_lock = threading.Lock()
+
+
+def request_recalculation(day, account=None):
+    """Asks the worker of account, by default the current one, to rebuild the
+    balance history from day, starting the worker if needed. Returns the worker."""
+    account = account or current_account.get()
+    with _workers_lock:
+        worker = _workers.get(account)
+        if worker is None:
+            worker = _workers[account] = RecalculationWorker(
+                account, debounce, max_delay, retry_delay, max_retry_delay, idle_timeout
+            )
+        worker.request(day)
+        return worker
+
+
+def recalculation_status(session):
+    """
+    Returns the status of the balance recalculation of the session's account.
+
+    The versions and last_error come from the worker of this process, while
+    current and dirty_from also take the watermark into account, so a rebuild
+    pending in another process (or after a restart) is reported as well.
+    """
+    with _workers_lock:
+        worker = _workers.get(session.account)
+    # An account without a worker has no rebuild pending in this process
+    status = (worker or RecalculationWorker(session.account)).status()
+
+    pending = consistency.dirty_from(session)
+    if pending is not None:
+        local = status["dirty_from"]
+        status["current"] = False
+        status["dirty_from"] = min(pending.isoformat(), local) if local else pending.isoformat()
+    return status
+
+
+def recalculate_on_commit(session, day):
+    """Asks the worker to rebuild the balance history from day once the session commits."""
+    dirty_from = session.info.get("recalculate_from")
+    if dirty_from is None or day < dirty_from:
+        session.info["recalculate_from"] = day
+
+
+@event.listens_for(Session, "after_commit")
+def _request_after_commit(session):
+    day = session.info.pop("recalculate_from", None)
+    if day is not None:
+        request_recalculation(day, session.account)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session):
+    session.info.pop("recalculate_from", None)
@@ -0,0 +1,43 @@
+import re
+
+from sqlalchemy import text
+
+from models import Transaction, transactions_fts
+import models
+
+TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def match_expression(term):
+    """Builds a FTS5 query matching every word of the term as a prefix.
+
+    Each word is quoted, so operators and punctuation typed by the user are
+    never interpreted by FTS5. Returns None if the term has no words.
+    """
+    tokens = TOKEN.findall(term)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def search_query(session, term):
+    """Returns the query_rows query of the transactions matching the term.
+
+    With the full text index the results are ordered by relevance (bm25),
+    otherwise by a LIKE scan on the description, most recent first.
+    """
+    rows = Transaction.query_rows(session)
+
+    if not models.search_enabled:
+        return rows\
+            .filter(Transaction.description.ilike(f'%{term}%'))\
+            .order_by(Transaction.date.desc(), Transaction.id.desc())
+
+    expression = match_expression(term)
+    if expression is None:
+        return rows.filter(text("0"))
+
+    return rows\
+        .join(transactions_fts, transactions_fts.c.rowid == Transaction.id)\
+        .filter(text("transactions_fts MATCH :expression").bindparams(expression=expression))\
+        .order_by(transactions_fts.c.rank, Transaction.date.desc(), Transaction.id.desc())
@@ -0,0 +1,114 @@
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+
+from flask import has_request_context, request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Statements slower than this are recorded; unset or 0 disables the recorder
+threshold_ms = float(os.environ.get("MYBALANCE_SLOW_QUERY_MS", 0))
+# Number of slow statements kept, the oldest are dropped first
+log_size = int(os.environ.get("MYBALANCE_SLOW_QUERY_LOG_SIZE", 100))
+
+# Query plans are captured once per statement; at most this many are kept
+MAX_PLANS = 256
+# Parameters of a statement beyond this count are not recorded
+MAX_PARAMETERS = 20
+
+
+def _json_safe(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def _route():
+    if not has_request_context():
+        return None
+    rule = request.url_rule.rule if request.url_rule is not None else request.path
+    return f"{request.method} {rule}"
+
+
+class SlowQueryLog:
+    """
+    Ring buffer of the statements that took longer than a threshold, with
+    the route that ran them and the query plan of the statement.
+    """
+
+    def __init__(self, threshold_ms, size):
+        self.threshold = threshold_ms / 1000
+        self._entries = deque(maxlen=size)
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, cursor, statement, parameters, executemany, duration):
+        rows = len(parameters) if executemany else None
+        if executemany:
+            parameters = parameters[0] if parameters else ()
+        entry = {
+            "sql": statement,
+            "parameters": [_json_safe(value) for value in list(parameters or ())[:MAX_PARAMETERS]],
+            "executemany_rows": rows,
+            "duration_ms": round(duration * 1000, 3),
+            "route": _route(),
+            "path": request.full_path.rstrip("?") if has_request_context() else None,
+            "at": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "plan": self._plan(cursor, statement, parameters),
+        }
+        self._entries.append(entry)
+        logger.warning(
+            "Slow query (%.1f ms) on %s: %s %s",
+            entry["duration_ms"], entry["route"] or "-", " ".join(statement.split()), entry["parameters"]
+        )
+
+    def _plan(self, cursor, statement, parameters):
+        """Returns the EXPLAIN QUERY PLAN lines of statement, computed once per statement."""
+        shape = re.sub(r"\s+", " ", statement).strip()
+        with self._lock:
+            plan = self._plans.get(shape)
+            if plan is not None:
+                self._plans.move_to_end(shape)
+                return plan
+
+        try:
+            # A new cursor on the same connection, so the results of the
+            # statement itself are left untouched and no event is fired
+            rows = cursor.connection.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ()).fetchall()
+            plan = [row[-1] for row in rows]
+        except Exception as e:
+            plan = [f"Plano indisponível: {e}"]
+
+        with self._lock:
+            self._plans[shape] = plan
+            while len(self._plans) > MAX_PLANS:
+                self._plans.popitem(last=False)
+        return plan
+
+    def entries(self):
+        """Returns the recorded statements, the newest first."""
+        return list(reversed(self._entries))
+
+
+slow_query_log = SlowQueryLog(threshold_ms, log_size) if threshold_ms > 0 else None
+
+
+def install(engine):
+    """Records the slow statements of engine, when the recorder is enabled."""
+    if slow_query_log is None:
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_statement(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("slow_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _end_statement(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["slow_query_start"].pop()
+        if duration >= slow_query_log.threshold:
+            slow_query_log.record(cursor, statement, parameters, executemany, duration)
@@ -0,0 +1,36 @@
+from flask import Response, current_app
+
+# Rows fetched from the database per round trip while streaming
+YIELD_PER = 500
+# Serialized items joined into a single chunk of the response body
+CHUNK_SIZE = 200
+
+
+def stream_json_array(items, prefix='[', suffix=lambda: ']', chunk_size=CHUNK_SIZE):
+    """Streams an iterable of JSON serializable items as a JSON array.
+
+    The body is written in chunks while the items are produced, so only one
+    chunk is kept in memory and the first byte is sent before the query ends.
+    prefix is written before the array items and suffix() after them; suffix
+    is only called once all items were consumed, so it can describe them
+    (e.g. a pagination cursor).
+    """
+    dumps = current_app.json.dumps
+    separators = (',', ':')
+
+    def generate():
+        yield prefix
+        separator = ''
+        chunk = []
+        for item in items:
+            chunk.append(item)
+            if len(chunk) >= chunk_size:
+                # Each chunk is encoded at once, as an array without its brackets
+                yield separator + dumps(chunk, separators=separators)[1:-1]
+                separator = ','
+                chunk = []
+        if chunk:
+            yield separator + dumps(chunk, separators=separators)[1:-1]
+        yield suffix()
+
+    return Response(generate(), mimetype='application/json')
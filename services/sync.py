@@ -0,0 +1,99 @@
+from functools import wraps
+
+from flask import g, has_request_context, request, make_response
+from sqlalchemy import func
+
+from models import Session, Transaction, ChangeLog
+from models.change_log import TRANSACTION, UPSERT, DELETE
+
+
+def data_version(session):
+    """Returns the current data version, bumped by every committed write."""
+    return session.query(func.max(ChangeLog.version)).scalar() or 0
+
+
+def _read_data_version():
+    session = Session()
+    try:
+        return data_version(session)
+    finally:
+        session.close()
+
+
+def current_data_version():
+    """
+    Returns the data version of the current account. In a conditional view
+    it is the version of the ETag, read once for the request, so the read
+    cache only serves payloads of exactly that version.
+    """
+    version = g.get("data_version") if has_request_context() else None
+    return version if version is not None else _read_data_version()
+
+
+def conditional(view):
+    """
+    Makes a GET view answer conditional requests. Responses carry the data
+    version as ETag, and a request whose If-None-Match holds the current
+    version gets an empty 304 without running the view.
+
+    The version is read before the view runs, so a response is never tagged
+    with a version newer than its data, and it is the version the read cache
+    checks its entries against (see current_data_version): a payload cached
+    at another version is computed again, never served under this ETag.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.data_version = _read_data_version()
+        etag = str(g.data_version)
+
+        if request.if_none_match.contains(etag):
+            response = make_response('', 304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        response.set_etag(etag)
+        return response
+
+    return wrapper
+
+
+def transaction_changes(session, since, limit):
+    """
+    Returns the transactions inserted, updated or deleted after the version
+    since, oldest first, as (changes, version, has_more). version is the
+    since to be used on the next call.
+    """
+    version = data_version(session)
+    entries = session.query(ChangeLog)\
+        .filter(ChangeLog.version > since, ChangeLog.version <= version)\
+        .filter(ChangeLog.entity == TRANSACTION)\
+        .order_by(ChangeLog.version)\
+        .limit(limit + 1)\
+        .all()
+
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    if has_more:
+        version = entries[-1].version
+
+    upserted = [entry.entity_id for entry in entries if entry.op == UPSERT]
+    rows = {}
+    if upserted:
+        for row in Transaction.query_rows(session).filter(Transaction.id.in_(upserted)):
+            rows[row.id] = Transaction.row_to_dict(row)
+
+    changes = []
+    for entry in entries:
+        # A row missing here was deleted after the log was read; its
+        # tombstone will also come in a later call
+        transaction = rows.get(entry.entity_id)
+        changes.append({
+            "version": entry.version,
+            "op": UPSERT if transaction else DELETE,
+            "id": entry.entity_id,
+            "transaction": transaction
+        })
+
+    return changes, version, has_more
@@ -0,0 +1,243 @@
+"""
+Micro-benchmarks dos trechos mais usados da API.
+
+Mede o recálculo do saldo em vários tamanhos de base (e, com o NumPy
+instalado, a carga e as consultas das análises), a serialização com to_dict,
+a validação dos schemas, a criação dos modelos e a codificação JSON das
+respostas (conferindo que o orjson gera os mesmos bytes). Os resultados são
+gravados em JSON e podem ser comparados com um baseline salvo anteriormente:
+
+    python test/benchmark/run_benchmarks.py --save-baseline baseline.json
+    python test/benchmark/run_benchmarks.py --baseline baseline.json --threshold 0.2
+
+A execução falha (código de saída 1) se algum benchmark ficar mais lento que o
+baseline além do limite.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+from datetime import date, datetime, timezone
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, os.path.join(REPO_ROOT, "test", "load_test"))
+
+LEDGER_SIZES = [1_000, 10_000, 100_000]
+ROUNDS = 5
+THRESHOLD = 0.2  # 20% slower than the baseline
+
+TRANSACTION_BODY = {
+    "description": "Supermercado",
+    "amount": 123.45,
+    "category_id": 1,
+    "date": "2024-05-17",
+    "type": "expense",
+}
+BALANCE_BODY = {"date": "2024-05-17", "income": "1500.00", "expense": "123.45", "balance": "98765.43"}
+
+
+def measure(function, rounds=ROUNDS):
+    """
+    Times function like timeit: each round runs it as many times as needed to
+    take at least 0.2s. Returns the seconds per call of every round.
+    """
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return [elapsed / number for elapsed in timer.repeat(repeat=rounds, number=number)], number
+
+
+def measure_once(function, rounds=ROUNDS):
+    """Times slow functions, one call per round."""
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return times, 1
+
+
+def ledger_benchmarks():
+    """Yields (name, function, measure) for calculate_balance at each ledger size."""
+    from generate_data import generate_transactions, DESCRIPTIONS
+    from models import Session, Transaction, Category
+    from services.balance import calculate_balance
+    from services import analytics
+
+    session = Session()
+    categories = [Category(name) for name in DESCRIPTIONS]
+    session.add_all(categories)
+    session.commit()
+    category_ids = {category.name: category.id for category in categories}
+    session.close()
+
+    inserted = 0
+    for size in LEDGER_SIZES:
+        # The ledger grows from one size to the next
+        session = Session()
+        rows = list(generate_transactions(size, category_ids, seed=size))[inserted:]
+        session.execute(Transaction.__table__.insert(), rows)
+        session.commit()
+        inserted = size
+
+        def rebuild(session=session):
+            calculate_balance(session)
+
+        yield f"calculate_balance[{size // 1000}k]", rebuild, measure_once
+
+        # The analytics are optional, they need NumPy
+        if analytics.numpy_enabled:
+            def build_snapshot(session=session):
+                analytics.LedgerSnapshot().get(session)
+
+            columns = analytics.LedgerSnapshot().get(session)
+            yield f"ledger_snapshot_build[{size // 1000}k]", build_snapshot, measure_once
+            yield f"analytics_rolling[{size // 1000}k]", \
+                lambda: analytics.rolling_average(columns, None, None, 30), measure
+            yield f"analytics_percentiles[{size // 1000}k]", \
+                lambda: analytics.monthly_percentiles(columns, None, None, [50, 90, 99]), measure
+            yield f"analytics_top_categories[{size // 1000}k]", \
+                lambda: analytics.top_categories(columns, None, None, 5), measure
+        session.close()
+
+
+def object_benchmarks():
+    """Yields (name, function, measure) for serialization, validation and model creation."""
+    from models import Session, Transaction, Category, BalanceHistory
+    from models.money import to_cents
+    from schemas import TransactionSchema, BalanceSchema
+
+    session = Session()
+    transactions = session.query(Transaction).limit(1000).all()
+    for transaction in transactions:
+        transaction.category  # loaded up front, so only to_dict is measured
+    categories = session.query(Category).all()
+    rows = Transaction.query_rows(session).limit(1000).all()
+    session.close()
+
+    yield "transaction_to_dict[1000]", lambda: [transaction.to_dict() for transaction in transactions], measure
+    yield "transaction_row_to_dict[1000]", lambda: [Transaction.row_to_dict(row) for row in rows], measure
+    yield "category_to_dict", lambda: [category.to_dict() for category in categories], measure
+    yield "transaction_schema", lambda: TransactionSchema(**TRANSACTION_BODY), measure
+    yield "balance_schema", lambda: BalanceSchema(**BALANCE_BODY), measure
+    yield "transaction_init", lambda: Transaction(
+        TRANSACTION_BODY["description"], TRANSACTION_BODY["amount"], TRANSACTION_BODY["date"],
+        TRANSACTION_BODY["type"]
+    ), measure
+    yield "balance_history_init", lambda: BalanceHistory(
+        date(2024, 5, 17), to_cents(BALANCE_BODY["balance"]),
+        income=to_cents(BALANCE_BODY["income"]), expense=to_cents(BALANCE_BODY["expense"])
+    ), measure
+
+
+def json_benchmarks():
+    """
+    Yields (name, function, measure) for the JSON encoding of a listing with
+    each provider, after checking that they produce the same bytes.
+    """
+    from flask import Flask
+    from flask.json.provider import DefaultJSONProvider
+    from models import Session, Transaction
+    from services.json_provider import FastJSONProvider, orjson_enabled, COMPACT
+
+    session = Session()
+    listing = {"transactions": [Transaction.row_to_dict(row) for row in Transaction.query_rows(session).limit(1000)]}
+    session.close()
+
+    app = Flask(__name__)
+    providers = {"stdlib": DefaultJSONProvider(app)}
+    if orjson_enabled:
+        providers["orjson"] = FastJSONProvider(app)
+    expected = providers["stdlib"].dumps(listing, separators=COMPACT)
+    for name, provider in providers.items():
+        if provider.dumps(listing, separators=COMPACT) != expected:
+            raise SystemExit(f"A saída JSON com {name} difere da saída da biblioteca padrão")
+        yield f"json_{name}[1000]", lambda provider=provider: provider.dumps(listing, separators=COMPACT), measure
+
+
+def run(selected=None):
+    """Runs the benchmarks (those whose name starts with one of selected) in a scratch database."""
+    # The models create the database on import, relative to the current directory
+    directory = tempfile.mkdtemp(prefix="mybalance-benchmark-")
+    os.chdir(directory)
+    sys.path.insert(0, REPO_ROOT)
+
+    results = {}
+    try:
+        for benchmarks in (ledger_benchmarks, object_benchmarks, json_benchmarks):
+            for name, function, measure_function in benchmarks():
+                if selected and not any(name.startswith(prefix) for prefix in selected):
+                    continue
+                times, number = measure_function(function)
+                results[name] = {
+                    "median": statistics.median(times),
+                    "min": min(times),
+                    "rounds": len(times),
+                    "number": number,
+                }
+                print(f"{name:<32} {results[name]['median'] * 1e6:>12.1f} µs")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "benchmarks": results,
+    }
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """Prints the change of each benchmark against the baseline and returns the regressed ones."""
+    regressions = []
+    print(f"\n{'Benchmark':<32} {'Baseline':>12} {'Atual':>12} {'Variação':>9}")
+    for name, result in results["benchmarks"].items():
+        previous = baseline["benchmarks"].get(name)
+        if previous is None:
+            print(f"{name:<32} {'-':>12} {result['median'] * 1e6:>12.1f} {'novo':>9}")
+            continue
+        change = result["median"] / previous["median"] - 1
+        marker = " <-" if change > threshold else ""
+        print(f"{name:<32} {previous['median'] * 1e6:>12.1f} {result['median'] * 1e6:>12.1f} {change:>+9.1%}{marker}")
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Roda os micro-benchmarks da API MyBalance.")
+    parser.add_argument("benchmarks", nargs="*", help="Prefixos dos benchmarks a rodar (padrão: todos)")
+    parser.add_argument("--output", help="Arquivo JSON onde gravar os resultados")
+    parser.add_argument("--baseline", help="Arquivo JSON de um baseline para comparar os resultados")
+    parser.add_argument("--save-baseline", help="Grava os resultados como baseline neste arquivo")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="Aumento relativo da mediana tolerado antes de falhar (padrão: 0.2)")
+    args = parser.parse_args()
+
+    # Paths are given relative to where the runner was started
+    paths = {name: os.path.abspath(path) for name, path in
+             (("output", args.output), ("baseline", args.baseline), ("save_baseline", args.save_baseline)) if path}
+
+    results = run(args.benchmarks)
+
+    for name in ("output", "save_baseline"):
+        if name in paths:
+            with open(paths[name], "w") as file:
+                json.dump(results, file, indent=2)
+
+    if "baseline" in paths:
+        with open(paths["baseline"]) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nRegressões acima de {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+# The application keeps its databases in database/ under the working
+# directory, so the tests run in a temporary one and leave the repository
+# databases untouched
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(tempfile.mkdtemp(prefix="mybalance-test-"))
+
+# The load test (locust) and the benchmarks are scripts, not test modules
+collect_ignore = ["load_test", "benchmark"]
+
+
+@pytest.fixture
+def account():
+    """A new account, so each test has its own empty database."""
+    return f"test-{uuid.uuid4().hex[:12]}"
@@ -0,0 +1,134 @@
+"""
+Gera um banco de dados sintético para os testes de carga.
+
+Os dados dependem apenas do tamanho e da semente, então dois bancos gerados
+com os mesmos parâmetros são idênticos. O banco é criado em
+<diretório>/database/db.sqlite3, o mesmo caminho usado pela API quando ela é
+iniciada a partir desse diretório:
+
+    python test/load_test/generate_data.py 100k --directory /tmp/mybalance-100k
+    cd /tmp/mybalance-100k && PYTHONPATH=<repositório> flask --app app run --port 6700
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+# Transactions are spread over these dates
+START_DATE = date(2020, 1, 1)
+END_DATE = date(2024, 12, 31)
+
+# Descriptions by category, also used as search terms by the load test
+DESCRIPTIONS = {
+    "Alimentação": ["Supermercado", "Padaria", "Feira", "Restaurante", "Lanchonete"],
+    "Moradia": ["Aluguel", "Condomínio", "Energia elétrica", "Água", "Internet"],
+    "Transporte": ["Combustível", "Estacionamento", "Ônibus", "Metrô", "Aplicativo de transporte"],
+    "Saúde": ["Farmácia", "Plano de saúde", "Consulta médica", "Exame"],
+    "Lazer": ["Cinema", "Streaming", "Viagem", "Show", "Livraria"],
+    "Educação": ["Mensalidade", "Curso online", "Material escolar"],
+    "Salário": ["Salário", "Décimo terceiro", "Férias"],
+    "Investimentos": ["Dividendos", "Rendimento poupança", "Resgate CDB"],
+}
+INCOME_CATEGORIES = {"Salário", "Investimentos"}
+# Share of the transactions without a category
+UNCATEGORIZED = 0.15
+INCOME_SHARE = 0.05
+
+BATCH_SIZE = 10_000
+
+
+def parse_size(value):
+    """Accepts 10k, 100k, 1m or a plain number of transactions."""
+    value = value.lower()
+    if value in SIZES:
+        return SIZES[value]
+    try:
+        return int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"tamanho inválido: {value}")
+
+
+def generate_transactions(size, category_ids, seed):
+    """Yields the rows of size synthetic transactions, ready to be inserted."""
+    rng = random.Random(seed)
+    days = (END_DATE - START_DATE).days
+    expense_categories = [name for name in DESCRIPTIONS if name not in INCOME_CATEGORIES]
+    income_categories = sorted(INCOME_CATEGORIES)
+
+    for _ in range(size):
+        income = rng.random() < INCOME_SHARE
+        name = rng.choice(income_categories if income else expense_categories)
+        if income:
+            amount = rng.randint(20_000, 500_000)  # in cents
+        else:
+            amount = int(rng.lognormvariate(8.5, 1.0)) + 100
+
+        yield {
+            "description": rng.choice(DESCRIPTIONS[name]),
+            "amount": amount,
+            "category_id": None if rng.random() < UNCATEGORIZED else category_ids[name],
+            "date": START_DATE + timedelta(days=rng.randint(0, days)),
+            "type": "income" if income else "expense",
+        }
+
+
+def generate_database(size, seed):
+    """Fills the database of the current directory, which must not exist yet."""
+    # The models create the database on import, relative to the current directory
+    sys.path.insert(0, REPO_ROOT)
+    from models import Session, Transaction, Category
+    from services.balance import calculate_balance
+
+    session = Session()
+    try:
+        if session.query(Transaction.id).first() is not None:
+            raise SystemExit("O banco de dados já possui transações; use um diretório vazio")
+
+        categories = [Category(name) for name in DESCRIPTIONS]
+        session.add_all(categories)
+        session.commit()
+        category_ids = {category.name: category.id for category in categories}
+
+        insert = Transaction.__table__.insert()
+        start = time.perf_counter()
+        batch = []
+        for row in generate_transactions(size, category_ids, seed):
+            batch.append(row)
+            if len(batch) == BATCH_SIZE:
+                session.execute(insert, batch)
+                batch.clear()
+        if batch:
+            session.execute(insert, batch)
+        session.commit()
+        print(f"{size} transações inseridas em {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        calculate_balance(session)
+        print(f"Saldos calculados em {time.perf_counter() - start:.1f}s")
+    finally:
+        session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera um banco de dados sintético para os testes de carga.")
+    parser.add_argument("size", type=parse_size, help="10k, 100k, 1m ou o número de transações")
+    parser.add_argument("--directory", default=None,
+                        help="Diretório do banco de dados (padrão: mybalance-<tamanho>)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    directory = args.directory or f"mybalance-{args.size}"
+    os.makedirs(directory, exist_ok=True)
+    os.chdir(directory)
+    generate_database(args.size, args.seed)
+    print(f"Banco de dados gerado em {os.path.join(os.getcwd(), 'database', 'db.sqlite3')}")
+
+
+if __name__ == "__main__":
+    main()
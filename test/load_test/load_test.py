@@ -1,76 +1,178 @@
-from locust import HttpUser, between, task
+"""
+Testes de carga da API MyBalance com o Locust.
 
+Gere um banco de dados com generate_data.py, inicie a API a partir do
+diretório dele e rode, por exemplo:
 
-class LoadTest(HttpUser):
+    locust -f test/load_test/load_test.py --headless -u 50 -r 10 -t 2m --csv resultados
+
+Ao final, a latência p50/p95/p99 e a vazão de cada endpoint são exibidas
+(e gravadas em resultados_stats.csv com --csv).
+"""
+import random
+from datetime import timedelta
+
+from locust import HttpUser, between, events, task
+
+from generate_data import DESCRIPTIONS, INCOME_CATEGORIES, START_DATE, END_DATE
+
+SEARCH_TERMS = sorted({word.lower() for descriptions in DESCRIPTIONS.values()
+                       for description in descriptions for word in description.split()})
+PAGE_SIZE = 50
+
+
+def random_period(max_days=90):
+    """Returns a (start, end) period of up to max_days within the generated dates."""
+    start = START_DATE + timedelta(days=random.randint(0, (END_DATE - START_DATE).days))
+    end = min(start + timedelta(days=random.randint(1, max_days)), END_DATE)
+    return start.isoformat(), end.isoformat()
+
+
+class ReaderUser(HttpUser):
     """
-    Configurando um teste de carga com o Locust
+    Usuário que apenas consulta: listagens, buscas e saldos. É a maior
+    parte do tráfego.
     """
-    wait_time = between(1, 3)
+    host = "http://127.0.0.1:6700"
+    weight = 8
+    wait_time = between(0.5, 2)
 
-    @task
-    def add_produto(self):
-        """ Fazendo a inserção de produtos aleatórios.
+    def on_start(self):
+        """ Guardando os ids de uma página de transações para consultá-las.
+        """
+        response = self.client.get('/transaction', params={"limit": PAGE_SIZE}, name="/transaction")
+        self.transaction_ids = [transaction["id"] for transaction in response.json()["transactions"]]
+
+    @task(10)
+    def list_transactions(self):
+        """ Listando transações, com filtros e às vezes a página seguinte.
+        """
+        params = {"limit": PAGE_SIZE}
+        if random.random() < 0.5:
+            params["date_from"], params["date_to"] = random_period()
+        if random.random() < 0.3:
+            params["type"] = random.choice(["income", "expense"])
+
+        response = self.client.get('/transaction', params=params, name="/transaction")
+        next_cursor = response.json().get("next_cursor") if response.ok else None
+        if next_cursor and random.random() < 0.3:
+            self.client.get('/transaction', params={**params, "cursor": next_cursor},
+                            name="/transaction?cursor")
+
+    @task(5)
+    def get_transaction(self):
+        """ Consultando uma transação pelo id.
+        """
+        if self.transaction_ids:
+            self.client.get(f'/transaction/{random.choice(self.transaction_ids)}', name="/transaction/[id]")
+
+    @task(4)
+    def search_transactions(self):
+        """ Buscando transações pelo termo da descrição ou da categoria.
+        """
+        self.client.get('/transaction/search', params={"term": random.choice(SEARCH_TERMS)},
+                        name="/transaction/search")
+
+    @task(3)
+    def list_categories(self):
+        """ Listando as categorias.
+        """
+        self.client.get('/category', name="/category")
+
+    @task(3)
+    def balance_history(self):
+        """ Consultando o histórico de saldo por dia, semana ou mês.
+        """
+        granularity = random.choice(["day", "week", "month"])
+        start, end = random_period(max_days=30 if granularity == "day" else 365)
+        self.client.get('/balance', params={"from": start, "to": end, "granularity": granularity},
+                        name=f"/balance?granularity={granularity}")
+
+    @task(6)
+    def current_balance(self):
+        """ Consultando o saldo atual.
         """
+        self.client.get('/balance/current', name="/balance/current")
+
+
+class WriterUser(HttpUser):
+    """
+    Usuário que registra transações e corrige ou remove as que criou, sem
+    alterar os dados gerados.
+    """
+    host = "http://127.0.0.1:6700"
+    weight = 2
+    wait_time = between(1, 3)
 
-        # criando o produto
-        produto = {
-            'nome': 'Camiseta',
-            'categoria': 'Roupas',
-            'descricao': 'Uma camiseta confortável e estilosa',
-            'marca': 'MarcaX',
-            'preco': '29.99'
+    def on_start(self):
+        response = self.client.get('/category', name="/category")
+        self.category_ids = {category["name"]: category["id"] for category in response.json()["categories"]}
+        self.created_ids = []
+
+    def random_transaction(self):
+        category = random.choice(list(DESCRIPTIONS))
+        day, _ = random_period()
+        return {
+            "description": random.choice(DESCRIPTIONS[category]),
+            "amount": round(random.uniform(5, 500), 2),
+            "category_id": self.category_ids.get(category),
+            "date": day,
+            "type": "income" if category in INCOME_CATEGORIES else "expense",
         }
-        # configurando a requisição
-        headers = {'Content-Type': 'multipart/form-data'}
-        response = self.client.post('produto', data=produto, headers=headers)
-
-        # verificando a resposta
-        data_response = response.json()
-        if response.status_code == 200:
-            print("Produto %s salvo na base" % produto["nome"])
-        elif response.status_code == 409:
-            print(data_response["mesage"] + produto["nome"])
-        else:
-            print('Falha na rota de adição de um produto')
 
-    @task
-    def listagem(self):
-        """ Fazendo uma listagem dos items salvos.
+    @task(5)
+    def add_transaction(self):
+        """ Inserindo uma transação aleatória.
         """
-        # configurando a requisição
-        response = self.client.get('produtos')
-    
-        # verificando a resposta
-        data = response.json()
-        if response.status_code == 200:
-            print('Total de items salvos: %d' % len(data["produtos"]))
-        else:
-            print('Falha na rota /produtos')
+        response = self.client.post('/transaction', json=self.random_transaction(), name="/transaction")
+        if response.status_code == 201:
+            self.created_ids.append(response.json()["id"])
 
-    @task
-    def get_produto(self):
-        """ Fazendo uma busca pelo produto de id 1.
+    @task(2)
+    def update_transaction(self):
+        """ Alterando uma das transações criadas.
+        """
+        if self.created_ids:
+            self.client.put(f'/transaction/{random.choice(self.created_ids)}', json=self.random_transaction(),
+                            name="/transaction/[id]")
+
+    @task(1)
+    def delete_transaction(self):
+        """ Removendo uma das transações criadas.
         """
-        # configurando a requisição
-        response = self.client.get('produto?id=1')
-    
-        # verificando a resposta
-        data = response.json()
-        if response.status_code == 200:
-            print('Produto visitado: %s' % data["nome"])
-        else:
-            print('Falha na rota /produto?id=1')
+        if self.created_ids:
+            transaction_id = self.created_ids.pop(random.randrange(len(self.created_ids)))
+            self.client.delete(f'/transaction/{transaction_id}', name="/transaction/[id]")
+
+
+class RecalculationUser(HttpUser):
+    """
+    Um único usuário que, de tempos em tempos, pede o recálculo completo do
+    histórico de saldo, como uma rotina administrativa.
+    """
+    host = "http://127.0.0.1:6700"
+    fixed_count = 1
+    wait_time = between(20, 40)
 
     @task
-    def busca_produto(self):
-        """ Fazendo uma busca por produtos que no tem o termo "Camisa".
+    def recalculate_balance(self):
+        """ Recalculando todo o histórico de saldo.
         """
-        # configurando a requisição
-        response = self.client.get('busca_produto?termo=Camisa')
-    
-        # verificando a resposta
-        data = response.json()
-        if response.status_code == 200:
-            print('Total de produtos : %d' % len(data["produtos"]))
-        else:
-            print('Falha na rota /busca_produto')
+        self.client.post('/balance/recalculate', name="/balance/recalculate")
+
+
+@events.test_stop.add_listener
+def report_latency(environment, **kwargs):
+    """ Exibindo p50/p95/p99 (ms) e a vazão (req/s) de cada endpoint.
+    """
+    stats = environment.stats
+    entries = sorted(stats.entries.values(), key=lambda entry: (entry.name, entry.method))
+    print(f"\n{'Endpoint':<48} {'Req.':>8} {'Falhas':>7} {'p50':>7} {'p95':>7} {'p99':>7} {'req/s':>8}")
+    for entry in entries + [stats.total]:
+        print(
+            f"{entry.method or '':<7} {entry.name:<40} {entry.num_requests:>8} {entry.num_failures:>7} "
+            f"{entry.get_response_time_percentile(0.5):>7.0f} "
+            f"{entry.get_response_time_percentile(0.95):>7.0f} "
+            f"{entry.get_response_time_percentile(0.99):>7.0f} "
+            f"{entry.total_rps:>8.1f}"
+        )
@@ -0,0 +1,18 @@
+import os
+
+from app import app
+from models import accounts_path
+
+
+def test_account_names_with_a_trailing_newline_are_rejected(account):
+    response = app.test_client().get(f"/accounts/{account}%0A/balance/current")
+
+    assert response.status_code == 400
+    assert not os.path.exists(os.path.join(accounts_path, f"{account}\n.sqlite3"))
+
+
+def test_an_empty_account_prefix_is_not_found():
+    client = app.test_client()
+
+    assert client.get("/accounts//balance/current").status_code == 404
+    assert client.get("/accounts/").status_code == 404
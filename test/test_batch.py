@@ -0,0 +1,59 @@
+from app import app
+from services.accounts import ACCOUNT_HEADER
+from test.test_concurrency import _assert_matches_rebuild, _create, _history, _monthly
+
+
+def _transactions(client, account):
+    response = client.get("/transaction/", headers={ACCOUNT_HEADER: account})
+    return sorted((t["id"], t["description"], t["amount"], t["date"]) for t in response.get_json()["transactions"])
+
+
+def test_a_mixed_batch_matches_a_full_rebuild(account):
+    client = app.test_client()
+    headers = {ACCOUNT_HEADER: account}
+    salary = _create(client, account, "Salário", 5000, "2024-01-15")
+    rent = _create(client, account, "Aluguel", 1500, "2024-02-01", "expense")
+    market = _create(client, account, "Mercado", 180, "2024-02-01", "expense")
+
+    response = client.post("/transaction/batch", headers=headers, json={"operations": [
+        {"op": "create", "transaction": {"description": "Bônus", "amount": 800, "date": "2024-03-05",
+                                         "type": "income"}},
+        {"op": "update", "id": rent, "transaction": {"description": "Aluguel", "amount": 1650,
+                                                     "date": "2024-03-01", "type": "expense"}},
+        {"op": "delete", "id": market},
+        {"op": "update", "id": salary, "transaction": {"description": "Salário", "amount": 5200,
+                                                       "date": "2024-01-15", "type": "income"}},
+        {"op": "create", "transaction": {"description": "Farmácia", "amount": 32.9, "date": "2024-01-20",
+                                         "type": "expense"}},
+    ]})
+
+    assert response.status_code == 200, response.get_json()
+    assert [result["op"] for result in response.get_json()["results"]] == \
+        ["create", "update", "delete", "update", "create"]
+    assert [day.isoformat() for day, *_ in _history(account)] == \
+        ["2024-01-15", "2024-01-20", "2024-03-01", "2024-03-05"]
+    _assert_matches_rebuild(account)
+
+
+def test_a_failing_operation_rolls_back_the_whole_batch(account):
+    client = app.test_client()
+    headers = {ACCOUNT_HEADER: account}
+    salary = _create(client, account, "Salário", 5000, "2024-01-15")
+    rent = _create(client, account, "Aluguel", 1500, "2024-02-01", "expense")
+    transactions, history, monthly = _transactions(client, account), _history(account), _monthly(account)
+
+    response = client.post("/transaction/batch", headers=headers, json={"operations": [
+        {"op": "create", "transaction": {"description": "Bônus", "amount": 800, "date": "2024-03-05",
+                                         "type": "income"}},
+        {"op": "update", "id": salary, "transaction": {"description": "Salário", "amount": 5200,
+                                                       "date": "2024-01-10", "type": "income"}},
+        {"op": "delete", "id": rent},
+        {"op": "delete", "id": rent + 1000},
+    ]})
+
+    assert response.status_code == 404
+    assert response.get_json()["message"].startswith("Operação 3:")
+    assert _transactions(client, account) == transactions
+    assert _history(account) == history
+    assert _monthly(account) == monthly
+    _assert_matches_rebuild(account)
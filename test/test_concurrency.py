@@ -0,0 +1,147 @@
+import threading
+from datetime import date
+from collections import Counter
+
+from app import app
+from models import Session, BalanceHistory, BalanceMonthly
+from services.accounts import ACCOUNT_HEADER
+from services.balance import calculate_balance
+
+# Requests racing on the same transaction in each round
+CONCURRENT_REQUESTS = 8
+ROUNDS = 5
+
+
+def _history(account):
+    session = Session(account=account)
+    try:
+        return session.query(
+            BalanceHistory.date, BalanceHistory.income, BalanceHistory.expense, BalanceHistory.balance
+        ).order_by(BalanceHistory.date).all()
+    finally:
+        session.close()
+
+
+def _monthly(account):
+    session = Session(account=account)
+    try:
+        return session.query(
+            BalanceMonthly.month, BalanceMonthly.income, BalanceMonthly.expense, BalanceMonthly.balance
+        ).order_by(BalanceMonthly.month).all()
+    finally:
+        session.close()
+
+
+def _rebuilt_history(account):
+    session = Session(account=account, write=True)
+    try:
+        calculate_balance(session)
+    finally:
+        session.close()
+    return _history(account)
+
+
+def _create(client, account, description, amount, date, type="income"):
+    response = client.post("/transaction/", headers={ACCOUNT_HEADER: account}, json={
+        "description": description, "amount": amount, "date": date, "type": type
+    })
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()["id"]
+
+
+def _assert_matches_rebuild(account):
+    """The incremental history and monthly rollup equal the ones calculate_balance rebuilds."""
+    history, monthly = _history(account), _monthly(account)
+    assert history == _rebuilt_history(account)
+    assert monthly == _monthly(account)
+
+
+def _race(requests):
+    """Runs the requests (functions of a test client) at the same time; returns their status codes."""
+    barrier = threading.Barrier(len(requests))
+    statuses = []
+
+    def run(request):
+        client = app.test_client()
+        barrier.wait()
+        statuses.append(request(client).status_code)
+
+    threads = [threading.Thread(target=run, args=(request,)) for request in requests]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return Counter(statuses)
+
+
+def test_concurrent_deletes_revert_the_transaction_once(account):
+    client = app.test_client()
+    headers = {ACCOUNT_HEADER: account}
+    _create(client, account, "Salário", 5000, "2024-01-15")
+    _create(client, account, "Aluguel", 1500, "2024-02-01", "expense")
+
+    for round in range(ROUNDS):
+        id = _create(client, account, f"Mercado {round}", 180, "2024-02-01", "expense")
+
+        statuses = _race([
+            lambda client: client.delete(f"/transaction/{id}", headers=headers)
+        ] * CONCURRENT_REQUESTS)
+
+        assert statuses == Counter({204: 1, 404: CONCURRENT_REQUESTS - 1})
+        _assert_matches_rebuild(account)
+
+
+def test_concurrent_updates_and_deletes_keep_the_history_consistent(account):
+    client = app.test_client()
+    headers = {ACCOUNT_HEADER: account}
+    _create(client, account, "Salário", 5000, "2024-01-15")
+
+    for round in range(ROUNDS):
+        id = _create(client, account, f"Mercado {round}", 180, "2024-02-01", "expense")
+
+        def update(amount):
+            return lambda client: client.put(f"/transaction/{id}", headers=headers, json={
+                "description": f"Mercado {round}", "amount": amount, "date": "2024-02-0%d" % (amount % 9 + 1),
+                "type": "expense"
+            })
+
+        delete = lambda client: client.delete(f"/transaction/{id}", headers=headers)
+        statuses = _race([update(100 + index) for index in range(CONCURRENT_REQUESTS // 2)] +
+                         [delete] * (CONCURRENT_REQUESTS // 2))
+
+        assert statuses[204] == 1
+        assert set(statuses) <= {200, 204, 404}
+        _assert_matches_rebuild(account)
+
+
+def test_sequential_writes_keep_the_history_consistent(account):
+    client = app.test_client()
+    headers = {ACCOUNT_HEADER: account}
+    salary = _create(client, account, "Salário", 5000, "2024-01-15")
+    rent = _create(client, account, "Aluguel", 1500, "2024-02-01", "expense")
+    market = _create(client, account, "Mercado", 180.45, "2024-02-01", "expense")
+    _create(client, account, "Farmácia", 32.9, "2024-03-10", "expense")
+    _assert_matches_rebuild(account)
+
+    def update(id, description, amount, date, type):
+        response = client.put(f"/transaction/{id}", headers=headers, json={
+            "description": description, "amount": amount, "date": date, "type": type
+        })
+        assert response.status_code == 200, response.get_json()
+
+    update(rent, "Aluguel", 1650, "2024-02-01", "expense")
+    _assert_matches_rebuild(account)
+
+    # Moving a transaction to another date (and month) reverts it on the old one
+    update(market, "Mercado", 180.45, "2024-03-20", "expense")
+    _assert_matches_rebuild(account)
+    update(salary, "Salário", 5200, "2024-02-05", "income")
+    _assert_matches_rebuild(account)
+    update(market, "Reembolso", 40, "2024-01-02", "income")
+    _assert_matches_rebuild(account)
+
+    assert client.delete(f"/transaction/{rent}", headers=headers).status_code == 204
+    _assert_matches_rebuild(account)
+    assert client.delete(f"/transaction/{salary}", headers=headers).status_code == 204
+    _assert_matches_rebuild(account)
+    assert [day for day, *_ in _history(account)] == [date(2024, 1, 2), date(2024, 3, 10)]
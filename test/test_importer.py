@@ -0,0 +1,41 @@
+import os
+
+from app import app
+from models import accounts_path
+from services.accounts import ACCOUNT_HEADER
+from test.test_concurrency import _history, _rebuilt_history
+from test.test_migrations import create_legacy_database
+
+CSV_HEADER = "description,amount,category_id,date,type\n"
+
+
+def _import(client, account, body):
+    return client.post("/transaction/bulk?format=csv", headers={ACCOUNT_HEADER: account}, data=body)
+
+
+def test_rows_rejected_by_the_database_are_reported_and_the_rest_imported(account):
+    # Databases from before the migration keep UNIQUE(description, category_id)
+    # and a required category, which the validation does not check
+    os.makedirs(accounts_path, exist_ok=True)
+    create_legacy_database(os.path.join(accounts_path, f"{account}.sqlite3"))
+    client = app.test_client()
+
+    response = _import(client, account, CSV_HEADER +
+                       "Aluguel,1500,2,2025-01-05,expense\n"
+                       "Feira,30,2,2025-01-06,expense\n"
+                       "Salário,5000,1,2025-01-05,income\n"
+                       "Sem categoria,10,,2025-01-07,expense\n")
+
+    assert response.status_code == 200
+    result = response.get_json()
+    assert result["received"] == 4
+    assert result["inserted"] == 2
+    assert result["failed"] == 2
+    assert [error["row"] for error in result["errors"]] == [2, 4]
+    for error in result["errors"]:
+        assert "INSERT" not in error["message"]
+
+    descriptions = sorted(t["description"] for t in client.get(
+        "/transaction/", headers={ACCOUNT_HEADER: account}).get_json()["transactions"])
+    assert descriptions == ["Aluguel", "Feira", "Padaria", "Salário", "Vitoria"]
+    assert _history(account) == _rebuilt_history(account)
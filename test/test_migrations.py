@@ -0,0 +1,106 @@
+import logging
+import sqlite3
+
+import pytest
+
+from models import create_sqlite_engine, setup_database
+
+# Schema and rows of a database created before money was stored as cents,
+# like the database/db.sqlite3 shipped with the project
+LEGACY_SCHEMA = """
+CREATE TABLE categories (
+    id INTEGER NOT NULL,
+    name VARCHAR NOT NULL,
+    description VARCHAR,
+    PRIMARY KEY (id),
+    UNIQUE (name)
+);
+CREATE TABLE transactions (
+    id INTEGER NOT NULL,
+    description VARCHAR(140),
+    amount FLOAT,
+    category_id INTEGER NOT NULL,
+    date DATETIME,
+    type VARCHAR(10) NOT NULL,
+    PRIMARY KEY (id),
+    CONSTRAINT transaction_unique_id UNIQUE (description, category_id),
+    FOREIGN KEY(category_id) REFERENCES categories (id)
+);
+CREATE TABLE balance_history (
+    id INTEGER NOT NULL,
+    date DATE NOT NULL,
+    income FLOAT NOT NULL,
+    expense FLOAT NOT NULL,
+    balance FLOAT NOT NULL,
+    PRIMARY KEY (id),
+    UNIQUE (date)
+);
+INSERT INTO categories (id, name) VALUES (1, 'Apostas'), (2, 'Mercado');
+INSERT INTO transactions (id, description, amount, category_id, date, type) VALUES
+    (1, 'Vitoria', 10.0, 1, '2025-01-01 00:00:00.000000', 'income'),
+    (2, 'Feira', 19.99, 2, '2025-01-02 00:00:00.000000', 'expense'),
+    (3, 'Padaria', 0.1, 2, '2025-01-02 00:00:00.000000', 'expense');
+INSERT INTO balance_history (id, date, income, expense, balance) VALUES
+    (1, '2025-01-01', 10.0, 0.0, 10.0),
+    (2, '2025-01-02', 0.0, 20.09, -10.09);
+"""
+
+
+def create_legacy_database(path):
+    """Creates a SQLite file with the schema and rows of a pre-cents database."""
+    connection = sqlite3.connect(path)
+    connection.executescript(LEGACY_SCHEMA)
+    connection.close()
+
+
+def _dump(path):
+    connection = sqlite3.connect(path)
+    try:
+        schema = connection.execute("SELECT type, name, sql FROM sqlite_master ORDER BY type, name").fetchall()
+        transactions = connection.execute(
+            "SELECT id, description, amount, category_id, date, type FROM transactions ORDER BY id"
+        ).fetchall()
+        history = connection.execute(
+            "SELECT date, income, expense, balance FROM balance_history ORDER BY date"
+        ).fetchall()
+        return schema, transactions, history
+    finally:
+        connection.close()
+
+
+def test_money_migration_converts_legacy_databases_once(tmp_path, caplog):
+    path = tmp_path / "legacy.sqlite3"
+    create_legacy_database(path)
+    engine = create_sqlite_engine(f"sqlite:///{path}")
+
+    with caplog.at_level(logging.INFO, logger="models.migrations"):
+        setup_database(engine)
+    assert "transactions convertida: 3 de 3 linhas copiadas" in caplog.text
+    assert "balance_history convertida: 2 de 2 linhas copiadas" in caplog.text
+
+    schema, transactions, history = _dump(path)
+    # Amounts in cents and dates as YYYY-MM-DD
+    assert transactions == [
+        (1, "Vitoria", 1000, 1, "2025-01-01", "income"),
+        (2, "Feira", 1999, 2, "2025-01-02", "expense"),
+        (3, "Padaria", 10, 2, "2025-01-02", "expense"),
+    ]
+    assert history == [("2025-01-01", 1000, 0, 1000), ("2025-01-02", 0, 2009, -1009)]
+
+    # The constraints of the legacy table are kept
+    connection = sqlite3.connect(path)
+    with pytest.raises(sqlite3.IntegrityError, match="UNIQUE"):
+        connection.execute("INSERT INTO transactions (description, amount, category_id, date, type) "
+                           "VALUES ('Feira', 100, 2, '2025-01-03', 'expense')")
+    with pytest.raises(sqlite3.IntegrityError, match="NOT NULL"):
+        connection.execute("INSERT INTO transactions (description, amount, date, type) "
+                           "VALUES ('Sem categoria', 100, '2025-01-03', 'expense')")
+    connection.close()
+
+    # A second startup finds nothing to convert
+    caplog.clear()
+    with caplog.at_level(logging.INFO, logger="models.migrations"):
+        setup_database(engine)
+    assert "convertida" not in caplog.text
+    assert _dump(path) == (schema, transactions, history)
+    engine.dispose()
@@ -0,0 +1,51 @@
+from datetime import date
+
+from app import app
+from models import Session
+from services import consistency, recalculation
+from services.accounts import ACCOUNT_HEADER
+
+
+def test_idle_workers_are_released(account, monkeypatch):
+    monkeypatch.setattr(recalculation, "debounce", 0.01)
+    monkeypatch.setattr(recalculation, "idle_timeout", 0.2)
+
+    worker = recalculation.request_recalculation(date.min, account)
+    thread = worker._thread
+    assert recalculation._workers[account] is worker
+
+    thread.join(timeout=10)
+    assert not thread.is_alive()
+    assert account not in recalculation._workers
+    assert worker.status()["current"]
+
+    # The next request of the account starts a new worker
+    worker = recalculation.request_recalculation(date.min, account)
+    assert recalculation._workers[account] is worker
+    assert worker._thread.is_alive()
+    worker._thread.join(timeout=10)
+    assert account not in recalculation._workers
+
+
+def test_the_status_reports_recalculations_pending_in_other_processes(account):
+    client = app.test_client()
+    headers = {ACCOUNT_HEADER: account}
+    assert client.get("/balance/status", headers=headers).get_json()["current"]
+
+    # A rebuild requested by another process is only known by the watermark
+    session = Session(account=account, write=True)
+    try:
+        consistency.mark_dirty(session, date(2024, 3, 1))
+        session.commit()
+    finally:
+        session.close()
+
+    status = client.get("/balance/status", headers=headers).get_json()
+    assert not status["current"]
+    assert status["dirty_from"] == "2024-03-01"
+    assert not client.get("/balance/current", headers=headers).get_json()["current"]
+
+    assert client.post("/balance/recalculate", headers=headers).status_code == 200
+    status = client.get("/balance/status", headers=headers).get_json()
+    assert status["current"]
+    assert status["dirty_from"] is None
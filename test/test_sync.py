@@ -0,0 +1,56 @@
+from app import app
+from services.accounts import ACCOUNT_HEADER
+from test.test_concurrency import _create
+
+
+def _changes(client, account, since):
+    response = client.get(f"/transaction/changes?since={since}", headers={ACCOUNT_HEADER: account})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_renaming_a_category_logs_its_transactions_again(account):
+    client = app.test_client()
+    headers = {ACCOUNT_HEADER: account}
+    response = client.post("/category/", headers=headers, json={"name": "Mercado"})
+    assert response.status_code == 201, response.get_json()
+    category = response.get_json()["id"]
+    response = client.post("/transaction/", headers=headers, json={
+        "description": "Feira", "amount": 30, "date": "2024-01-05", "type": "expense", "category_id": category
+    })
+    assert response.status_code == 201, response.get_json()
+    id = response.get_json()["id"]
+    other = _create(client, account, "Salário", 5000, "2024-01-01")
+    version = _changes(client, account, 0)["version"]
+
+    response = client.put(f"/category/{category}", headers=headers, json={"name": "Supermercado"})
+    assert response.status_code == 200, response.get_json()
+
+    changes = _changes(client, account, version)["changes"]
+    assert [(change["id"], change["op"]) for change in changes] == [(id, "upsert")]
+    assert changes[0]["transaction"]["category"]["name"] == "Supermercado"
+    assert other not in [change["id"] for change in changes]
+
+
+def test_etags_answer_304_until_a_write(account):
+    client = app.test_client()
+    headers = {ACCOUNT_HEADER: account}
+    _create(client, account, "Salário", 5000, "2024-01-01")
+
+    response = client.get("/balance/current", headers=headers)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert response.get_json()["balance"] == "5000.00"
+
+    response = client.get("/balance/current", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+
+    # A write through another client makes the cached response stale
+    _create(app.test_client(), account, "Aluguel", 1500, "2024-01-02", "expense")
+
+    response = client.get("/balance/current", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.get_json()["balance"] == "3500.00"
+    response = client.get("/balance/current", headers={**headers, "If-None-Match": response.headers["ETag"]})
+    assert response.status_code == 304